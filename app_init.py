@@ -1,3 +1,7 @@
 from flask import Flask
 
+from scripts.metricas import configurar_logs
+
+configurar_logs()
+
 app = Flask(__name__)
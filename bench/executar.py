@@ -0,0 +1,193 @@
+"""
+Benchmark offline dos quatro pipelines (SAE, SAB, SAF e SMT).
+
+Gera arquivos sintéticos em vários tamanhos, sobe um servidor local no
+lugar dos sites do governo e roda cada pipeline contra ele, apontando os
+scripts para o servidor pelas variáveis INDICA_URL_*. Cada repetição roda
+num processo separado, para que o pico de memória e o cache sejam os de
+uma requisição fria.
+
+Uso (na raiz do projeto):
+    python -m bench.executar --tamanhos 10000,100000 --repeticoes 3
+    python -m bench.executar --pipelines SAE,SAB --json resultados.json
+
+SAF precisa do Java (Tabula) e SMT do Chromium do Playwright; se eles não
+estiverem instalados, o pipeline aparece como falha e os outros seguem.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARCADOR = "RESULTADO_BENCH "
+PIPELINES = ["SAE", "SAB", "SAF", "SMT"]
+
+
+def _rodar_pipeline(pipeline):
+    """
+    Executado no processo filho: roda um pipeline e imprime as métricas.
+    """
+    from bench.fixtures import ANO, MES
+    from scripts.metricas import etapa, resumo
+
+    inicio = time.perf_counter()
+    # A etapa "total" amostra a memória do filho durante o pipeline inteiro.
+    # O ru_maxrss não serve aqui: no Linux ele atravessa o fork/exec e traria
+    # o pico do processo pai (que gerou as fixtures).
+    with etapa(pipeline, "total"):
+        if pipeline == "SAE":
+            from scripts.SAE import processar_sae
+            resultado, _ = processar_sae(tipo="EXP", ano=str(ANO), mes=MES, uf="BA")
+        elif pipeline == "SAB":
+            from scripts.SAB import processar_sab
+            resultado, _ = processar_sab(ano=ANO, mes=MES)
+        elif pipeline == "SAF":
+            from scripts.SAF import processar_saf
+            resultado, _ = processar_saf(ano=ANO, mes=MES)
+        else:
+            from scripts.SMT import processar_smt
+            resultado, _ = processar_smt(uf="BA", ano=ANO, mes_num=MES)
+    latencia = time.perf_counter() - inicio
+
+    etapas = resumo()
+    print(MARCADOR + json.dumps({
+        "ok": resultado is not None,
+        "latencia_s": latencia,
+        "pico_rss_bytes": max(m.get("pico_rss_bytes", 0) for m in etapas.values()),
+        "etapas": etapas,
+    }))
+
+
+def _ambiente(url_base, pasta):
+    env = dict(os.environ)
+    env.update({
+        "INDICA_URL_COMEXSTAT": f"{url_base}/comexstat/",
+        "INDICA_URL_ESTBAN": f"{url_base}/estban/",
+        "INDICA_URL_SEFAZ": f"{url_base}/sefaz/",
+        "INDICA_URL_IBGE": f"{url_base}/ibge/codigos-dos-municipios.html#BA",
+        "INDICA_URL_CAGED": f"{url_base}/caged/novo-caged.html",
+        "INDICA_PASTA_SMT": os.path.join(pasta, "saida_smt"),
+    })
+    return env
+
+
+def _executar_filho(pipeline, env):
+    processo = subprocess.run(
+        [sys.executable, "-m", "bench.executar", "--rodar", pipeline],
+        cwd=RAIZ, env=env, capture_output=True, text=True
+    )
+    for linha in processo.stdout.splitlines():
+        if linha.startswith(MARCADOR):
+            return json.loads(linha[len(MARCADOR):])
+    erro = (processo.stderr.strip().splitlines() or ["sem saída"])[-1]
+    return {"ok": False, "erro": erro}
+
+
+def _agregar(execucoes):
+    """
+    Junta as repetições de um pipeline: latência e, por etapa, médias de
+    duração e vazão e o maior pico de memória.
+    """
+    validas = [e for e in execucoes if e.get("ok")]
+    if not validas:
+        return {"ok": False, "erro": execucoes[-1].get("erro", "pipeline não gerou arquivo")}
+
+    latencias = [e["latencia_s"] for e in validas]
+    etapas = {}
+    for execucao in validas:
+        for nome, medidas in execucao["etapas"].items():
+            etapas.setdefault(nome, []).append(medidas)
+
+    resumo_etapas = {}
+    for nome, lista in etapas.items():
+        duracao = statistics.mean(m["duracao_segundos"] for m in lista)
+        linhas = statistics.mean(m.get("linhas_entrada", m.get("linhas_saida", 0)) for m in lista)
+        bytes_ = statistics.mean(m.get("bytes", 0) for m in lista)
+        resumo_etapas[nome] = {
+            "duracao_s": duracao,
+            "linhas": linhas,
+            "linhas_por_s": linhas / duracao if duracao else 0,
+            "mb_por_s": bytes_ / 1024 / 1024 / duracao if duracao else 0,
+            "pico_rss_mb": max(m.get("pico_rss_bytes", 0) for m in lista) / 1024 / 1024,
+            "memoria_extra_mb": statistics.mean(m.get("memoria_extra_bytes", 0) for m in lista) / 1024 / 1024,
+        }
+
+    return {
+        "ok": True,
+        "repeticoes": len(validas),
+        "latencia_min_s": min(latencias),
+        "latencia_mediana_s": statistics.median(latencias),
+        "latencia_max_s": max(latencias),
+        "pico_rss_mb": max(e["pico_rss_bytes"] for e in validas) / 1024 / 1024,
+        "etapas": resumo_etapas,
+    }
+
+
+def _imprimir(tamanho, pipeline, resultado):
+    if not resultado["ok"]:
+        print(f"{pipeline:<4} {tamanho:>9}  FALHOU: {resultado['erro']}")
+        return
+
+    print(
+        f"{pipeline:<4} {tamanho:>9}  latência min/mediana/max: "
+        f"{resultado['latencia_min_s']:.2f}/{resultado['latencia_mediana_s']:.2f}/"
+        f"{resultado['latencia_max_s']:.2f}s  pico RSS: {resultado['pico_rss_mb']:.0f} MB"
+    )
+    for nome, etapa in sorted(resultado["etapas"].items()):
+        print(
+            f"     {nome:<22} {etapa['duracao_s']:>8.3f}s "
+            f"{etapa['linhas_por_s']:>12.0f} linhas/s {etapa['mb_por_s']:>8.2f} MB/s "
+            f"{etapa['pico_rss_mb']:>7.0f} MB (+{etapa['memoria_extra_mb']:.0f} MB)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline dos pipelines.")
+    parser.add_argument("--tamanhos", default="10000,100000",
+                        help="Quantidade de linhas dos arquivos sintéticos (separadas por vírgula).")
+    parser.add_argument("--pipelines", default=",".join(PIPELINES))
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--json", help="Salva os resultados completos neste arquivo.")
+    parser.add_argument("--rodar", choices=PIPELINES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.rodar:
+        _rodar_pipeline(args.rodar)
+        return
+
+    from bench.fixtures import gerar_todos
+    from bench.servidor import iniciar_servidor
+
+    tamanhos = [int(t) for t in args.tamanhos.split(",")]
+    pipelines = [p.strip().upper() for p in args.pipelines.split(",")]
+    resultados = {}
+
+    for tamanho in tamanhos:
+        with tempfile.TemporaryDirectory(prefix="bench_indica_") as pasta:
+            servidor, url_base = iniciar_servidor(pasta)
+            try:
+                inicio = time.perf_counter()
+                gerar_todos(pasta, tamanho, url_base)
+                print(f"\n== {tamanho} linhas (fixtures geradas em {time.perf_counter() - inicio:.1f}s) ==")
+
+                env = _ambiente(url_base, pasta)
+                for pipeline in pipelines:
+                    execucoes = [_executar_filho(pipeline, env) for _ in range(args.repeticoes)]
+                    resultado = _agregar(execucoes)
+                    resultados[f"{pipeline}/{tamanho}"] = resultado
+                    _imprimir(tamanho, pipeline, resultado)
+            finally:
+                servidor.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
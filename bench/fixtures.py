@@ -0,0 +1,221 @@
+"""
+Gera arquivos sintéticos com o mesmo formato das fontes do governo:
+CSV do Comexstat, ZIP do ESTBAN, PDF de arrecadação da SEFAZ,
+planilha do Novo Caged ("Tabela 8") e a página de códigos do IBGE.
+"""
+import io
+import os
+import random
+import zipfile
+
+import pandas as pd
+
+ANO = 2025
+MES = 1
+
+UFS = ["AC", "AL", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MG", "PE", "PR", "RJ", "RS", "SC", "SP"]
+MESES_CAGED = ["Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho"]
+
+# O PDF real da SEFAZ tem poucas páginas; ele cresce mais devagar que os outros
+LINHAS_POR_PAGINA_PDF = 50
+DIVISOR_PDF = 100
+
+
+def _municipios(quantidade):
+    return [f"MUNICIPIO {i:05d}" for i in range(quantidade)]
+
+
+def _valor_br(rng):
+    valor = rng.uniform(0, 5_000_000)
+    inteiro, decimal = f"{valor:.2f}".split(".")
+    return f"{int(inteiro):,}".replace(",", ".") + "," + decimal
+
+
+def gerar_comexstat(pasta, tamanho, rng):
+    """
+    EXP_{ANO}_MUN.csv e IMP_{ANO}_MUN.csv, separados por ';'.
+    """
+    df = pd.DataFrame({
+        "CO_ANO": ANO,
+        "CO_MES": [rng.randint(1, 12) for _ in range(tamanho)],
+        "SH4": [rng.randint(100, 9999) for _ in range(tamanho)],
+        "CO_PAIS": [rng.randint(1, 999) for _ in range(tamanho)],
+        "SG_UF_MUN": [rng.choice(UFS) for _ in range(tamanho)],
+        "CO_MUN": [rng.randint(1100015, 5300108) for _ in range(tamanho)],
+        "KG_LIQUIDO": [rng.randint(0, 10_000_000) for _ in range(tamanho)],
+        "VL_FOB": [rng.randint(0, 50_000_000) for _ in range(tamanho)],
+    })
+    destino = os.path.join(pasta, "comexstat")
+    os.makedirs(destino, exist_ok=True)
+    for tipo in ["EXP", "IMP"]:
+        df.to_csv(os.path.join(destino, f"{tipo}_{ANO}_MUN.csv"), sep=";", index=False)
+
+
+def gerar_estban(pasta, tamanho, rng):
+    """
+    {ANO}{MES}_ESTBAN.csv.zip com duas linhas de cabeçalho antes das colunas.
+    """
+    df = pd.DataFrame({
+        "#DATA_BASE": f"{ANO}{MES:02d}",
+        "UF": [rng.choice(UFS) for _ in range(tamanho)],
+        "CODMUN": [rng.randint(1100015, 5300108) for _ in range(tamanho)],
+        "MUNICIPIO": [f"MUNICIPIO {rng.randint(0, 5000):05d}" for _ in range(tamanho)],
+        "CNPJ": [f"{rng.randint(0, 99999999):08d}" for _ in range(tamanho)],
+        "NOME_INSTITUICAO": [f"BANCO {rng.randint(0, 300)}" for _ in range(tamanho)],
+        "VERBETE_110_CAIXA": [rng.randint(0, 10**9) for _ in range(tamanho)],
+        "VERBETE_160_OPERACOES_DE_CREDITO": [rng.randint(0, 10**10) for _ in range(tamanho)],
+        "VERBETE_420_DEPOSITOS_DE_POUPANCA": [rng.randint(0, 10**10) for _ in range(tamanho)],
+    })
+    csv = io.StringIO()
+    csv.write("ESTBAN - Estatística Bancária Mensal por Município\n")
+    csv.write(f"Data-base: {MES:02d}/{ANO}\n")
+    df.to_csv(csv, sep=";", index=False)
+
+    destino = os.path.join(pasta, "estban")
+    os.makedirs(destino, exist_ok=True)
+    nome = f"{ANO}{MES:02d}_ESTBAN"
+    with zipfile.ZipFile(os.path.join(destino, f"{nome}.csv.zip"), "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{nome}.CSV", csv.getvalue().encode("latin-1"))
+
+
+def _escapar_pdf(texto):
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _pdf_tabela(linhas):
+    """
+    Monta um PDF mínimo (Helvetica, WinAnsi) com as linhas em colunas fixas,
+    várias páginas, do jeito que o Tabula lê o arquivo da SEFAZ.
+    """
+    colunas_x = [30, 200, 270, 330, 390, 450, 520]
+    cabecalho = ["MUNICÍPIOS", "ICMS", "IPVA", "ITD", "TAXAS", "NO MÊS", "TOTAL ATÉ O MÊS"]
+
+    paginas = [
+        linhas[i:i + LINHAS_POR_PAGINA_PDF]
+        for i in range(0, len(linhas), LINHAS_POR_PAGINA_PDF)
+    ] or [[]]
+
+    objetos = []  # (numero, bytes)
+    num_fonte = 3
+    objetos.append((num_fonte, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"))
+
+    refs_paginas = []
+    proximo = 4
+    for pagina in paginas:
+        conteudo = ["BT", "/F1 7 Tf"]
+        y = 760
+        for linha in [cabecalho] + pagina + [["TOTAIS - PÁGINA"]]:
+            for x, celula in zip(colunas_x, linha):
+                conteudo.append(f"1 0 0 1 {x} {y} Tm ({_escapar_pdf(celula)}) Tj")
+            y -= 14
+        conteudo.append("ET")
+        fluxo = "\n".join(conteudo).encode("cp1252")
+
+        num_conteudo, num_pagina = proximo, proximo + 1
+        proximo += 2
+        objetos.append((num_conteudo, b"<< /Length %d >>\nstream\n" % len(fluxo) + fluxo + b"\nendstream"))
+        objetos.append((num_pagina, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {num_fonte} 0 R >> >> /Contents {num_conteudo} 0 R >>"
+        ).encode()))
+        refs_paginas.append(f"{num_pagina} 0 R")
+
+    objetos.append((1, b"<< /Type /Catalog /Pages 2 0 R >>"))
+    objetos.append((2, f"<< /Type /Pages /Kids [{' '.join(refs_paginas)}] /Count {len(refs_paginas)} >>".encode()))
+    objetos.sort()
+
+    saida = io.BytesIO()
+    saida.write(b"%PDF-1.4\n")
+    posicoes = {}
+    for numero, corpo in objetos:
+        posicoes[numero] = saida.tell()
+        saida.write(b"%d 0 obj\n" % numero + corpo + b"\nendobj\n")
+    inicio_xref = saida.tell()
+    saida.write(b"xref\n0 %d\n" % (len(objetos) + 1))
+    saida.write(b"0000000000 65535 f \n")
+    for numero in range(1, len(objetos) + 1):
+        saida.write(b"%010d 00000 n \n" % posicoes[numero])
+    saida.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, inicio_xref))
+    return saida.getvalue()
+
+
+def gerar_sefaz(pasta, tamanho, rng):
+    """
+    arrec{AA}{mes}.pdf com a tabela de arrecadação por município.
+    """
+    quantidade = max(LINHAS_POR_PAGINA_PDF, tamanho // DIVISOR_PDF)
+    linhas = [
+        [nome] + [_valor_br(rng) for _ in range(6)]
+        for nome in _municipios(quantidade)
+    ]
+    destino = os.path.join(pasta, "sefaz")
+    os.makedirs(destino, exist_ok=True)
+    with open(os.path.join(destino, f"arrec{str(ANO)[-2:]}jan.pdf"), "wb") as f:
+        f.write(_pdf_tabela(linhas))
+
+
+def gerar_ibge(pasta, tamanho, rng):
+    """
+    Página com a tabela <thead id="BA"> de códigos dos municípios.
+    """
+    quantidade = max(LINHAS_POR_PAGINA_PDF, tamanho // DIVISOR_PDF)
+    linhas = "\n".join(
+        f"<tr><td>{nome.title()}</td><td>{2900000 + i}</td></tr>"
+        for i, nome in enumerate(_municipios(quantidade))
+    )
+    html = (
+        "<html><body>"
+        "<table><thead id=\"AC\"><tr><th>Municípios do Acre</th><th>Códigos</th></tr></thead>"
+        "<tbody><tr><td>Acrelândia</td><td>1200013</td></tr></tbody></table>"
+        "<table><thead id=\"BA\"><tr><th>Municípios da Bahia</th><th>Códigos</th></tr></thead>"
+        f"<tbody>{linhas}</tbody></table>"
+        "</body></html>"
+    )
+    destino = os.path.join(pasta, "ibge")
+    os.makedirs(destino, exist_ok=True)
+    with open(os.path.join(destino, "codigos-dos-municipios.html"), "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+def gerar_caged(pasta, tamanho, rng, url_base):
+    """
+    Tabelas.xlsx (com a "Tabela 8"), a página do Novo Caged com o link
+    "Tabelas.xlsx" e a página intermediária com o botão "Baixar".
+    """
+    dados = {
+        "UF": [rng.choice(UFS) for _ in range(tamanho)],
+        "Código do Município": [rng.randint(1100015, 5300108) for _ in range(tamanho)],
+        "Município": [f"Municipio {i:06d}" for i in range(tamanho)],
+    }
+    for nome_mes in MESES_CAGED:
+        dados[f"{nome_mes}/{ANO}"] = [rng.randint(-500, 500) for _ in range(tamanho)]
+    df = pd.DataFrame(dados)
+
+    destino = os.path.join(pasta, "caged")
+    os.makedirs(destino, exist_ok=True)
+    with pd.ExcelWriter(os.path.join(destino, "Tabelas.xlsx")) as writer:
+        pd.DataFrame({"Sumário": ["Novo Caged - sintético"]}).to_excel(writer, sheet_name="Sumário", index=False)
+        # A planilha real tem 4 linhas de título antes do cabeçalho (header=4)
+        df.to_excel(writer, sheet_name="Tabela 8", index=False, startrow=4)
+
+    with open(os.path.join(destino, "novo-caged.html"), "w", encoding="utf-8") as f:
+        f.write(
+            "<html><head><title>Novo Caged</title></head><body>"
+            f"<a href=\"{url_base}/caged/tabelas-view.html\">Tabelas.xlsx</a>"
+            "</body></html>"
+        )
+    with open(os.path.join(destino, "tabelas-view.html"), "w", encoding="utf-8") as f:
+        f.write(
+            "<html><head><title>Tabelas.xlsx</title></head><body>"
+            f"<button onclick=\"window.location.href='{url_base}/caged/Tabelas.xlsx'\">Baixar</button>"
+            "</body></html>"
+        )
+
+
+def gerar_todos(pasta, tamanho, url_base, semente=42):
+    rng = random.Random(semente)
+    gerar_comexstat(pasta, tamanho, rng)
+    gerar_estban(pasta, tamanho, rng)
+    gerar_sefaz(pasta, tamanho, rng)
+    gerar_ibge(pasta, tamanho, rng)
+    gerar_caged(pasta, tamanho, rng, url_base)
@@ -0,0 +1,32 @@
+"""
+Servidor HTTP local que faz o papel dos sites do governo no benchmark.
+Serve os arquivos gerados por bench/fixtures.py (GET e HEAD).
+"""
+import functools
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(SimpleHTTPRequestHandler):
+
+    def end_headers(self):
+        # A planilha do Novo Caged chega como download, igual ao site real
+        if self.path.endswith(".xlsx"):
+            self.send_header("Content-Disposition", 'attachment; filename="Tabelas.xlsx"')
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def iniciar_servidor(pasta):
+    """
+    Sobe o servidor numa porta livre em segundo plano.
+    Retorna (servidor, url_base).
+    """
+    handler = functools.partial(_Handler, directory=pasta)
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+    host, porta = servidor.server_address
+    return servidor, f"http://{host}:{porta}"
@@ -0,0 +1,32 @@
+import os
+import shutil
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Threads por worker: o controle de admissão (scripts/admissao.py) decide
+# quantos jobs pesados rodam juntos dentro do orçamento de memória e deixa
+# INDICA_THREADS_LEVES threads livres para as rotas leves. Fica no ambiente
+# para os workers usarem o mesmo valor.
+threads = int(os.environ.setdefault("INDICA_THREADS", "8"))
+
+# Com INDICA_PRELOAD=1 o mestre importa o app (e os pipelines) antes do
+# fork; os workers sobem mais rápido e compartilham essas páginas.
+preload_app = os.environ.get("INDICA_PRELOAD") == "1"
+
+# Cada worker grava suas métricas nesta pasta e /metrics soma todas,
+# para o Prometheus ver os mesmos contadores qualquer que seja o worker.
+os.environ.setdefault("INDICA_METRICAS_DIR", os.path.join(tempfile.gettempdir(), "indica_metricas"))
+
+
+def on_starting(server):
+    # Métricas de uma execução anterior do servidor não devem ser somadas
+    shutil.rmtree(os.environ["INDICA_METRICAS_DIR"], ignore_errors=True)
+
+
+def post_fork(server, worker):
+    # Threads e a JVM do Tabula não sobrevivem ao fork: no modo preload o
+    # agendador (e o aquecimento dos dados) só começa dentro de cada worker.
+    if preload_app and os.environ.get("INDICA_AGENDADOR") == "1":
+        from scripts.agendador import iniciar_agendador
+        iniciar_agendador()
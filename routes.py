@@ -1,15 +1,55 @@
+import logging
+import uuid
+
 # Imports do Flask
 from flask import (
     render_template, request, jsonify, 
-    send_file, url_for, redirect
+    send_file, url_for, redirect, g, Response
 )
-from scripts.SAE import processar_sae
-from scripts.SAB import processar_sab
-from scripts.SMT import processar_smt
-from scripts.SAF import processar_saf
+# Os scripts (pandas, tabula, playwright...) são importados dentro de cada
+# rota, para o worker só carregar o pipeline que realmente atender.
+from scripts import admissao, metricas
+from scripts.admissao import CapacidadeEsgotada, admitir
+from scripts.metricas import etapa, id_requisicao
 
 from app_init import app  
 
+logger = logging.getLogger("indica.rotas")
+
+# --- ID de Requisição (aparece em todos os logs) ---
+@app.before_request
+def definir_id_requisicao():
+    rid = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:12]
+    g.id_requisicao = rid
+    g.token_id_requisicao = id_requisicao.set(rid)
+
+@app.after_request
+def expor_id_requisicao(response):
+    response.headers['X-Request-ID'] = g.get('id_requisicao', '-')
+    return response
+
+@app.teardown_request
+def limpar_id_requisicao(exc):
+    token = g.pop('token_id_requisicao', None)
+    if token is not None:
+        id_requisicao.reset(token)
+
+# --- Rota de Métricas (formato Prometheus) ---
+@app.route('/metrics')
+def metrics():
+    texto = metricas.renderizar_prometheus() + admissao.renderizar_prometheus()
+    return Response(texto, mimetype='text/plain; version=0.0.4')
+
+# --- Resposta quando não há memória para mais um job pesado ---
+def resposta_ocupado(erro):
+    logger.warning(f"Requisição recusada: {erro}")
+    response = Response(
+        f"Erro: {erro} Tente novamente em alguns instantes.",
+        status=503, mimetype='text/plain'
+    )
+    response.headers['Retry-After'] = str(erro.retry_after)
+    return response
+
 # --- Rota da Página Principal ---
 @app.route('/')
 def index():
@@ -25,19 +65,25 @@ def processar_download():
         uf = request.form.get('uf')
         tipo_opcao = request.form.get('tipo') 
 
-        print(f"--- ROTA /processar-sae CHAMADA ---")
-        print(f"Formulário: Ano={ano}, Mês={mes}, UF={uf}, Tipo={tipo_opcao}")
+        logger.info(f"--- ROTA /processar-sae CHAMADA ---")
+        logger.info(f"Formulário: Ano={ano}, Mês={mes}, UF={uf}, Tipo={tipo_opcao}")
 
         try:
-            buffer, nome_arquivo = processar_sae(
-                tipo=tipo_opcao,
-                ano=ano,
-                mes=mes,
-                uf=uf
-            )
+            from scripts.SAE import processar_sae
+
+            with admitir("SAE", tipo=tipo_opcao, ano=ano, mes=mes):
+                with etapa("SAE", "total") as m:
+                    buffer, nome_arquivo = processar_sae(
+                        tipo=tipo_opcao,
+                        ano=ano,
+                        mes=mes,
+                        uf=uf
+                    )
+                    if buffer is None:
+                        m["status"] = "erro"
             
             if buffer is not None:
-                print(f"Sucesso. Enviando arquivo: {nome_arquivo}")
+                logger.info(f"Sucesso. Enviando arquivo: {nome_arquivo}")
                 return send_file(
                     buffer,
                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
@@ -46,11 +92,13 @@ def processar_download():
                 )
 
             else:
-                print("Falha no script (buffer is None).")
+                logger.error("Falha no script (buffer is None).")
                 return "Erro: Não foi possível gerar o arquivo. Verifique os filtros."
                 
+        except CapacidadeEsgotada as e:
+            return resposta_ocupado(e)
         except Exception as e:
-            print(f"Erro catastrófico na rota: {e}")
+            logger.error(f"Erro catastrófico na rota: {e}")
             return "Erro interno do servidor."
 
     return redirect(url_for('index'))
@@ -62,17 +110,23 @@ def processar_saf_route():
         ano = request.form.get('ano')
         mes = request.form.get('mes')
 
-        print("--- ROTA /processar-saf CHAMADA ---")
-        print(f"Formulário: Ano={ano}, Mês={mes}")
+        logger.info("--- ROTA /processar-saf CHAMADA ---")
+        logger.info(f"Formulário: Ano={ano}, Mês={mes}")
 
         try:
-            buffer, nome_arquivo = processar_saf(
-                ano_full=ano,
-                mes_num=mes
-            )
+            from scripts.SAF import processar_saf
+
+            with admitir("SAF", ano=ano, mes=mes):
+                with etapa("SAF", "total") as m:
+                    buffer, nome_arquivo = processar_saf(
+                        ano=ano,
+                        mes=mes
+                    )
+                    if buffer is None:
+                        m["status"] = "erro"
             
             if buffer is not None:
-                print(f"Sucesso. Enviando arquivo: {nome_arquivo}")
+                logger.info(f"Sucesso. Enviando arquivo: {nome_arquivo}")
                 response = send_file(
                     buffer,
                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
@@ -82,11 +136,13 @@ def processar_saf_route():
                 response.headers['Access-Control-Expose-Headers'] = 'Content-Disposition'
                 return response
             else:
-                print("Falha no script SAF (buffer is None).")
+                logger.error("Falha no script SAF (buffer is None).")
                 return "Erro: Não foi possível gerar o arquivo. Verifique os filtros, os logs e se o Java está instalado.", 500
                 
+        except CapacidadeEsgotada as e:
+            return resposta_ocupado(e)
         except Exception as e:
-            print(f"Erro catastrófico na rota SAF: {e}")
+            logger.error(f"Erro catastrófico na rota SAF: {e}")
             return "Erro interno do servidor.", 500
 
     return redirect(url_for('index'))
@@ -100,19 +156,25 @@ def processar_sab_route():
         ano = request.form.get('ano')
         mes = request.form.get('mes')
 
-        print("--- ROTA /processar-sab CHAMADA ---")
-        print(f"Formulário: Ano={ano}, Mês={mes}")
+        logger.info("--- ROTA /processar-sab CHAMADA ---")
+        logger.info(f"Formulário: Ano={ano}, Mês={mes}")
 
         try:
             # Chama o script SAB
-            buffer, nome_arquivo = processar_sab(
-                ano=ano,
-                mes=mes
-            )
+            from scripts.SAB import processar_sab
+
+            with admitir("SAB", ano=ano, mes=mes):
+                with etapa("SAB", "total") as m:
+                    buffer, nome_arquivo = processar_sab(
+                        ano=ano,
+                        mes=mes
+                    )
+                    if buffer is None:
+                        m["status"] = "erro"
             
             #Verifica o resultado e envia o arquivo
             if buffer is not None:
-                print(f"Sucesso. Enviando arquivo: {nome_arquivo}")
+                logger.info(f"Sucesso. Enviando arquivo: {nome_arquivo}")
                 
                 response = send_file(
                     buffer,
@@ -123,12 +185,14 @@ def processar_sab_route():
                 response.headers['Access-Control-Expose-Headers'] = 'Content-Disposition'
                 return response
             else:
-                print("Falha no script SAB (buffer is None).")
+                logger.error("Falha no script SAB (buffer is None).")
                 # Retorna um status de erro que o 'fetch' pode pegar
                 return "Erro: Não foi possível gerar o arquivo. Verifique os filtros ou os logs.", 500
                 
+        except CapacidadeEsgotada as e:
+            return resposta_ocupado(e)
         except Exception as e:
-            print(f"Erro catastrófico na rota SAB: {e}")
+            logger.error(f"Erro catastrófico na rota SAB: {e}")
             return "Erro interno do servidor.", 500
 
     return redirect(url_for('index'))
@@ -141,19 +205,25 @@ def processar_smt_route():
         ano = request.form.get('ano')
         mes = request.form.get('mes')
 
-        print("--- ROTA /processar-smt CHAMADA ---")
-        print(f"Formulário: UF={uf}, Ano={ano}, Mês={mes}")
+        logger.info("--- ROTA /processar-smt CHAMADA ---")
+        logger.info(f"Formulário: UF={uf}, Ano={ano}, Mês={mes}")
 
         try:
             #Chama o script SMT 
-            buffer, nome_arquivo = processar_smt(
-                uf=uf,
-                ano=ano,
-                mes_num=mes
-            )
+            from scripts.SMT import processar_smt
+
+            with admitir("SMT", uf=uf, ano=ano, mes=mes):
+                with etapa("SMT", "total") as m:
+                    buffer, nome_arquivo = processar_smt(
+                        uf=uf,
+                        ano=ano,
+                        mes_num=mes
+                    )
+                    if buffer is None:
+                        m["status"] = "erro"
             
             if buffer is not None:
-                print(f"Sucesso. Enviando arquivo: {nome_arquivo}")
+                logger.info(f"Sucesso. Enviando arquivo: {nome_arquivo}")
                 response = send_file(
                     buffer,
                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
@@ -163,11 +233,19 @@ def processar_smt_route():
                 response.headers['Access-Control-Expose-Headers'] = 'Content-Disposition'
                 return response
             else:
-                print("Falha no script SMT (buffer is None).")
+                logger.error("Falha no script SMT (buffer is None).")
                 return "Erro: Não foi possível gerar o arquivo. Verifique os filtros ou os logs.", 500
                 
+        except CapacidadeEsgotada as e:
+            return resposta_ocupado(e)
         except Exception as e:
-            print(f"Erro catastrófico na rota SMT: {e}")
+            logger.error(f"Erro catastrófico na rota SMT: {e}")
             return "Erro interno do servidor.", 500
 
-    return redirect(url_for('index'))
\ No newline at end of file
+    return redirect(url_for('index'))
+
+# --- Rota de Status dos Dados Pré-carregados ---
+@app.route('/status-dados')
+def status_dados():
+    from scripts.agendador import estado
+    return jsonify(estado())
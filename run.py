@@ -1,5 +1,19 @@
+import os
+
 from app_init import app  
 import routes
 
+# Modo preload (INDICA_PRELOAD=1 + preload_app do gunicorn.conf.py):
+# o mestre só importa os pipelines antes do fork; o agendador (que baixa
+# os dados) sobe em cada worker, no post_fork.
+if os.environ.get("INDICA_PRELOAD") == "1":
+    from scripts.precarga import precarregar
+    precarregar()
+
+# Agendador que pré-carrega as novas publicações em segundo plano
+elif os.environ.get("INDICA_AGENDADOR") == "1":
+    from scripts.agendador import iniciar_agendador
+    iniciar_agendador()
+
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=True)
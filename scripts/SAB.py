@@ -1,32 +1,91 @@
+import logging
 import requests
 import zipfile
 import os
 import pandas as pd
 import io
 
+from scripts import cache_dados
+from scripts.baixador import baixar_varios
+from scripts.metricas import etapa
 
-def baixar_e_processar_zip_em_memoria(ano, mes):
+logger = logging.getLogger("indica.sab")
+
+# Pode ser trocada por variável de ambiente (ex.: servidor local do benchmark)
+URL_ESTBAN = os.environ.get(
+    "INDICA_URL_ESTBAN",
+    "https://www.bcb.gov.br/content/estatisticas/estatistica_bancaria_estban/municipio/"
+)
+
+
+def link_estban(ano, mes):
+    mes_str = f"{mes:02d}"
+    ano_SAB = f"{ano}{mes_str}"
+    nome_zip = f"{ano_SAB}_ESTBAN.csv.zip"
+    return f"{URL_ESTBAN}{nome_zip}"
+
+
+def baixar_e_processar_zip_em_memoria(ano, mes, usar_cache=True):
     """
     Baixa o ZIP, extrai o CSV e processa o DataFrame (filtrando para BA), 
     tudo em memória.
+    Se o agendador já deixou o mês quente, usa a cópia em memória.
     """
-    mes_str = f"{mes:02d}"
-    ano_SAB = f"{ano}{mes_str}"
-    nome_zip = f"{ano_SAB}_ESTBAN.csv.zip"
-    url_base = "https://www.bcb.gov.br/content/estatisticas/estatistica_bancaria_estban/municipio/"
-    link_download = f"{url_base}{nome_zip}"
+    chave = ("SAB", ano, mes)
+    if usar_cache:
+        df = cache_dados.obter(chave)
+        if df is not None:
+            logger.info(f"Usando dados já carregados em memória: ESTBAN {ano}{mes:02d}")
+            return df
+
+    link_download = link_estban(ano, mes)
 
-    print(f"Baixando e processando em memória: {link_download}...")
+    logger.info(f"Baixando e processando em memória: {link_download}...")
     
     try:
-        resposta = requests.get(link_download, timeout=60) 
-        
-        if resposta.status_code != 200:
-            print(f"Erro: Falha ao baixar o arquivo. Status: {resposta.status_code}")
-            return None
+        with etapa("SAB", "download") as m:
+            resposta = requests.get(link_download, timeout=60) 
+            
+            if resposta.status_code != 200:
+                logger.error(f"Erro: Falha ao baixar o arquivo. Status: {resposta.status_code}")
+                m["status"] = "erro"
+                return None
+            m["bytes"] = len(resposta.content)
+
+        logger.info("Download concluído. Abrindo ZIP em memória...")
+        df = processar_zip_em_memoria(resposta.content)
+        if df is not None:
+            cache_dados.guardar(chave, df)
+        return df
+
+    except Exception as e:
+        logger.error(f"Ocorreu um erro inesperado em baixar_e_processar_zip_em_memoria: {e}")
+        return None
+
+
+def baixar_e_processar_varios_meses(periodos):
+    """
+    Baixa os ZIPs de vários meses ao mesmo tempo e processa cada um.
+    Recebe [(ano, mes), ...] e retorna um dict {(ano, mes): DataFrame ou None}.
+    """
+    links = [link_estban(ano, mes) for ano, mes in periodos]
+    conteudos = baixar_varios([{"url": link, "timeout": 60, "fonte": "SAB"} for link in links])
+
+    resultados = {}
+    for (ano, mes), conteudo in zip(periodos, conteudos):
+        df = processar_zip_em_memoria(conteudo) if conteudo else None
+        if df is not None:
+            cache_dados.guardar(("SAB", ano, mes), df)
+        resultados[(ano, mes)] = df
+    return resultados
+
 
-        print("Download concluído. Abrindo ZIP em memória...")
-        with zipfile.ZipFile(io.BytesIO(resposta.content), "r") as zip_ref:
+def processar_zip_em_memoria(conteudo_zip):
+    """
+    Abre o ZIP do ESTBAN já baixado, lê o CSV e filtra para BA.
+    """
+    try:
+        with zipfile.ZipFile(io.BytesIO(conteudo_zip), "r") as zip_ref:
             nome_csv = None
             for nome in zip_ref.namelist():
                 if nome.lower().endswith('.csv'):
@@ -34,31 +93,35 @@ def baixar_e_processar_zip_em_memoria(ano, mes):
                     break
             
             if not nome_csv:
-                print("Erro: Nenhum arquivo .csv encontrado dentro do ZIP.")
+                logger.error("Erro: Nenhum arquivo .csv encontrado dentro do ZIP.")
                 return None
 
-            print(f"Encontrado {nome_csv}. Lendo CSV...")
-            with zip_ref.open(nome_csv) as arquivo_csv_em_memoria:
+            logger.info(f"Encontrado {nome_csv}. Lendo CSV...")
+            with etapa("SAB", "leitura") as m, zip_ref.open(nome_csv) as arquivo_csv_em_memoria:
                 df = pd.read_csv(
                     arquivo_csv_em_memoria, 
                     encoding='latin-1', 
                     skiprows=2, 
                     sep=';'
                 )
+                m["linhas_saida"] = len(df)
 
-        print("Processando DataFrame...")
+        logger.info("Processando DataFrame...")
         df.columns = df.columns.str.strip()
         
         if 'UF' not in df.columns:
-            print("Erro: Coluna 'UF' não encontrada.")
+            logger.error("Erro: Coluna 'UF' não encontrada.")
             return None
         
 
-        df_filtrado = df[df['UF'] == 'BA']
+        with etapa("SAB", "filtro") as m:
+            m["linhas_entrada"] = len(df)
+            df_filtrado = df[df['UF'] == 'BA']
+            m["linhas_saida"] = len(df_filtrado)
         return df_filtrado
 
     except Exception as e:
-        print(f"Ocorreu um erro inesperado em baixar_e_processar_zip_em_memoria: {e}")
+        logger.error(f"Ocorreu um erro inesperado em processar_zip_em_memoria: {e}")
         return None
 
 
@@ -69,12 +132,12 @@ def processar_sab(ano, mes):
     """
     
     # --- 1. Validação de Inputs ---
-    print(f"Processando SAB: ano={ano}, mes={mes}")
+    logger.info(f"Processando SAB: ano={ano}, mes={mes}")
     try:
         ano_int = int(ano)
         mes_int = int(mes)
     except (ValueError, TypeError):
-        print(f"Erro: Ano '{ano}' ou Mês '{mes}' não são números inteiros válidos.")
+        logger.error(f"Erro: Ano '{ano}' ou Mês '{mes}' não são números inteiros válidos.")
         return None, None # Retorna (buffer, nome)
 
     # --- 2. Baixar e Processar ---
@@ -86,21 +149,24 @@ def processar_sab(ano, mes):
         nome_excel = f"ESTBAN_BA_{id_arquivo}.xlsx"
         
         try:
-            print(f"Salvando arquivo na memória: {nome_excel}")
+            logger.info(f"Salvando arquivo na memória: {nome_excel}")
             output_buffer = io.BytesIO()
-            df_final.to_excel(output_buffer, index=False)
+            with etapa("SAB", "excel") as m:
+                m["linhas_entrada"] = len(df_final)
+                df_final.to_excel(output_buffer, index=False)
+                m["bytes"] = output_buffer.tell()
             output_buffer.seek(0)
             
-            print("Sucesso: Buffer SAB criado.")
+            logger.info("Sucesso: Buffer SAB criado.")
             return output_buffer, nome_excel
         
         except Exception as e:
-            print(f"Erro ao salvar o Excel na memória: {e}")
+            logger.error(f"Erro ao salvar o Excel na memória: {e}")
             return None, None
     
     elif df_final is not None:
-        print("Processamento SAB concluído, mas sem dados para salvar.")
+        logger.warning("Processamento SAB concluído, mas sem dados para salvar.")
         return None, None
     else:
-        print("Processamento SAB falhou (download/processamento).")
+        logger.error("Processamento SAB falhou (download/processamento).")
         return None, None
\ No newline at end of file
@@ -1,28 +1,53 @@
+import logging
 import requests
 import os
 import pandas as pd
 import io  # Importa a biblioteca para IO em memória
 import urllib3 
 
+from scripts import admissao, cache_dados
+from scripts.metricas import etapa
+
+logger = logging.getLogger("indica.sae")
+
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning) #silenciar os avisos
 
-def baixar_em_memoria(tipo, ano):
+# Pode ser trocada por variável de ambiente (ex.: servidor local do benchmark)
+URL_COMEXSTAT = os.environ.get(
+    "INDICA_URL_COMEXSTAT",
+    "https://balanca.economia.gov.br/balanca/bd/comexstat-bd/mun/"
+)
+
+def link_comexstat(tipo, ano):
+    return f"{URL_COMEXSTAT}{tipo}_{ano}_MUN.csv"
+
+
+def baixar_em_memoria(tipo, ano, usar_cache=True):
     """
     Baixa o CSV do Comexstat para a memória (usando streaming) 
     e o carrega em um DataFrame.
+    Se o agendador já deixou o arquivo quente, usa a cópia em memória.
     """
-    url_base = "https://balanca.economia.gov.br/balanca/bd/comexstat-bd/mun/"
-    link_download = f"{url_base}{tipo}_{ano}_MUN.csv"
+    chave = ("SAE", tipo, ano)
+    if usar_cache:
+        df = cache_dados.obter(chave)
+        if df is not None:
+            logger.info(f"Usando dados já carregados em memória: {tipo}_{ano}")
+            return df
+
+    link_download = link_comexstat(tipo, ano)
 
-    print(f"Baixando e processando em memória (streaming): {link_download}...")
+    logger.info(f"Baixando e processando em memória (streaming): {link_download}...")
     
     try:
         # 3. Usamos 'stream=True' e um 'with' statement
-        with requests.get(link_download, timeout=600, verify=False, stream=True) as resposta:
+        with etapa("SAE", "download") as m, \
+                requests.get(link_download, timeout=600, verify=False, stream=True) as resposta:
             
             # Verifica o status DEPOIS de obter a resposta
             if resposta.status_code != 200:
-                print(f"Erro: Falha ao baixar o arquivo. Status: {resposta.status_code}")
+                logger.error(f"Erro: Falha ao baixar o arquivo. Status: {resposta.status_code}")
+                m["status"] = "erro"
                 return None
 
             # 4. Cria um buffer em memória para escrever os "pedaços"
@@ -35,26 +60,31 @@ def baixar_em_memoria(tipo, ano):
                     buffer_em_memoria.write(chunk)
                     total_baixado += len(chunk)
 
-            print(f"Download (streaming) concluído. Total: {total_baixado / 1024 / 1024:.2f} MB")
+            m["bytes"] = total_baixado
+            admissao.registrar_tamanho(chave, total_baixado)
+            logger.info(f"Download (streaming) concluído. Total: {total_baixado / 1024 / 1024:.2f} MB")
             
-            # 6. "Rebobina" o buffer para o início
-            buffer_em_memoria.seek(0)
-            
-            # 7. Lê o buffer em memória com o Pandas
+        # 6. "Rebobina" o buffer para o início
+        buffer_em_memoria.seek(0)
+        
+        # 7. Lê o buffer em memória com o Pandas
+        with etapa("SAE", "leitura") as m:
             df = pd.read_csv(
                 buffer_em_memoria, 
                 encoding='utf-8', 
                 sep=';'
             )
+            m["linhas_saida"] = len(df)
             
-        print("DataFrame carregado com sucesso.")
+        logger.info("DataFrame carregado com sucesso.")
+        cache_dados.guardar(chave, df)
         return df
 
     except requests.exceptions.RequestException as e:
-        print(f"Erro de conexão ou streaming: {e}")
+        logger.error(f"Erro de conexão ou streaming: {e}")
         return None
     except Exception as e:
-        print(f"Ocorreu um erro inesperado em baixar_em_memoria: {e}")
+        logger.error(f"Ocorreu um erro inesperado em baixar_em_memoria: {e}")
         return None
 
 def processar_sae(tipo, ano, mes, uf):
@@ -64,7 +94,7 @@ def processar_sae(tipo, ano, mes, uf):
     """
     
     # --- 1. Validação de Inputs ---
-    print(f"Processando SAE: tipo={tipo}, ano={ano}, mes={mes}, uf={uf}")
+    logger.info(f"Processando SAE: tipo={tipo}, ano={ano}, mes={mes}, uf={uf}")
     try:
         tipo = str(tipo).strip().upper()
         ano = str(ano).strip()
@@ -72,45 +102,55 @@ def processar_sae(tipo, ano, mes, uf):
         uf = str(uf).strip().upper()
         
         if tipo not in ["IMP", "EXP"]:
-            print(f"Erro: Tipo inválido '{tipo}'.")
+            logger.error(f"Erro: Tipo inválido '{tipo}'.")
             return None, None # Retorna falha (buffer, nome)
 
     except ValueError:
-        print(f"Erro: Mês '{mes}' não é um número inteiro válido.")
+        logger.error(f"Erro: Mês '{mes}' não é um número inteiro válido.")
         return None, None
     except Exception as e:
-        print(f"Erro nos parâmetros: {e}")
+        logger.error(f"Erro nos parâmetros: {e}")
         return None, None
 
     # --- 2. Baixar e Carregar o DataFrame ---
+    veio_do_cache = cache_dados.obter(("SAE", tipo, ano)) is not None
     df = baixar_em_memoria(tipo, ano)
+
+    # O arquivo do ano corrente cresce todo mês: se o mês pedido não está
+    # na cópia em memória, ela pode ser anterior à publicação.
+    if veio_do_cache and 'CO_MES' in df.columns and not (df['CO_MES'] == mes_int).any():
+        logger.info(f"Mês {mes_int} ausente dos dados em memória. Baixando de novo...")
+        df = baixar_em_memoria(tipo, ano, usar_cache=False)
     
     if df is None:
-        print("Download falhou. Abortando.")
+        logger.error("Download falhou. Abortando.")
         return None, None
 
     # --- 3. Filtrar o DataFrame ---
     df_filtrado = None
     try:
-        print(f"Filtrando por UF == '{uf}' e Mês == {mes_int}...")
+        logger.info(f"Filtrando por UF == '{uf}' e Mês == {mes_int}...")
         coluna_uf = 'SG_UF_MUN'
         coluna_mes = 'CO_MES'
         
         if coluna_uf not in df.columns or coluna_mes not in df.columns:
-            print("Erro: Colunas esperadas (SG_UF_MUN, CO_MES) não encontradas.")
+            logger.error("Erro: Colunas esperadas (SG_UF_MUN, CO_MES) não encontradas.")
             return None, None
 
-        condicao_uf = (df[coluna_uf] == uf)
-        condicao_mes = (df[coluna_mes] == mes_int) # Usa o int
-        
-        df_filtrado = df[condicao_uf & condicao_mes]
+        with etapa("SAE", "filtro") as m:
+            m["linhas_entrada"] = len(df)
+            condicao_uf = (df[coluna_uf] == uf)
+            condicao_mes = (df[coluna_mes] == mes_int) # Usa o int
+            
+            df_filtrado = df[condicao_uf & condicao_mes]
+            m["linhas_saida"] = len(df_filtrado)
 
         if df_filtrado.empty:
-            print("Aviso: Nenhum dado encontrado para os filtros.")
+            logger.warning("Aviso: Nenhum dado encontrado para os filtros.")
             return None, None # Nada para salvar
     
     except Exception as e:
-        print(f"Erro durante a filtragem: {e}")
+        logger.error(f"Erro durante a filtragem: {e}")
         return None, None
 
     # --- 4. Salvar em Excel (NA MEMÓRIA) ---
@@ -118,22 +158,25 @@ def processar_sae(tipo, ano, mes, uf):
         nome_excel = f"SAE_{tipo}_{ano}_{uf}_{mes_int:02d}.xlsx"
         
         try:
-            print(f"Salvando arquivo na memória: {nome_excel}")
+            logger.info(f"Salvando arquivo na memória: {nome_excel}")
             
             # Cria um "arquivo" em memória
             output_buffer = io.BytesIO()
             
             # Salva o Excel no buffer
-            df_filtrado.to_excel(output_buffer, index=False)
+            with etapa("SAE", "excel") as m:
+                m["linhas_entrada"] = len(df_filtrado)
+                df_filtrado.to_excel(output_buffer, index=False)
+                m["bytes"] = output_buffer.tell()
             
             # "Rebobina" o buffer para o início
             output_buffer.seek(0) 
             
-            print("Sucesso: Buffer criado.")
+            logger.info("Sucesso: Buffer criado.")
             return output_buffer, nome_excel # SUCESSO!
         
         except Exception as e:
-            print(f"Erro ao salvar o Excel na memória: {e}")
+            logger.error(f"Erro ao salvar o Excel na memória: {e}")
             return None, None
     
     return None, None # Caso algo falhe
@@ -1,53 +1,54 @@
+import logging
 import pandas as pd
 import tabula
-import requests
 import os
 import re
 import unicodedata
 from bs4 import BeautifulSoup
 import io
 
+from scripts import cache_dados
+from scripts.baixador import baixar_varios
+from scripts.metricas import etapa
+
+logger = logging.getLogger("indica.saf")
+
 
 # =========================
 # DOWNLOAD SAF
 # =========================
+# Podem ser trocadas por variável de ambiente (ex.: servidor local do benchmark)
+URL_SEFAZ = os.environ.get(
+    "INDICA_URL_SEFAZ",
+    "https://www.sefaz.ba.gov.br/docs/financas-publicas/arrecadacao/"
+)
+URL_IBGE = os.environ.get(
+    "INDICA_URL_IBGE",
+    "https://www.ibge.gov.br/explica/codigos-dos-municipios.php#BA"
+)
+
+
 def extracao(ano, mes):
-    base_url_saf = "https://www.sefaz.ba.gov.br/docs/financas-publicas/arrecadacao/"
-    link = f"{base_url_saf}arrec{ano}{mes}.pdf"
+    link = f"{URL_SEFAZ}arrec{ano}{mes}.pdf"
     nome_arquivo = f"{ano}_{mes}_SAF.pdf"
-    print(f"Preparando para baixar de: {link}")
+    logger.info(f"Preparando para baixar de: {link}")
     return link, nome_arquivo
 
 
-def download(link):
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/140.0.0.0 Safari/537.36"
-        )
-    }
-
-    try:
-        with requests.get(link, stream=True, headers=headers, timeout=60) as r:
-            r.raise_for_status()
-            buffer = io.BytesIO()
-            for chunk in r.iter_content(8192):
-                if chunk:
-                    buffer.write(chunk)
-            buffer.seek(0)
-            print("Download concluído com sucesso (em memória).")
-            return buffer
-    except requests.exceptions.RequestException as e:
-        print(f"Erro ao baixar o arquivo: {e}")
-        return None
+HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/140.0.0.0 Safari/537.36"
+    )
+}
 
 
 # =========================
 # PDF → DATAFRAME
 # =========================
 def transformar_pdf_em_dataframe(pdf_buffer):
-    print("Lendo tabelas do PDF (Tabula)...")
+    logger.info("Lendo tabelas do PDF (Tabula)...")
     try:
         dfs = tabula.read_pdf(
             pdf_buffer,
@@ -58,13 +59,13 @@ def transformar_pdf_em_dataframe(pdf_buffer):
         )
 
         if not dfs:
-            print("Nenhuma tabela encontrada no PDF.")
+            logger.warning("Nenhuma tabela encontrada no PDF.")
             return None
 
-        print(f"{len(dfs)} tabelas extraídas.")
+        logger.info(f"{len(dfs)} tabelas extraídas.")
         return dfs
     except Exception as e:
-        print(f"Erro ao ler PDF com Tabula: {e}")
+        logger.error(f"Erro ao ler PDF com Tabula: {e}")
         return None
 
 
@@ -150,12 +151,9 @@ def processar_df(df):
 # =========================
 # IBGE
 # =========================
-def download_codigos_ibge():
-    url = "https://www.ibge.gov.br/explica/codigos-dos-municipios.php#BA"
+def ler_codigos_ibge(html):
     try:
-        r = requests.get(url, timeout=20)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = BeautifulSoup(html, "html.parser")
 
         head = soup.find("thead", {"id": "BA"})
         table = head.find_parent("table")
@@ -171,7 +169,7 @@ def download_codigos_ibge():
 
         return df
     except Exception as e:
-        print(f"Erro IBGE: {e}")
+        logger.error(f"Erro IBGE: {e}")
         return None
 
 
@@ -185,34 +183,79 @@ MES_MAP = {
 }
 
 
-def processar_saf(ano, mes):
-    ano = str(ano)[-2:]
-    mes = MES_MAP.get(str(mes))
-
-    if not mes:
-        return None, None
+def carregar_df_saf(ano, mes, usar_cache=True):
+    """
+    Baixa o PDF da SEFAZ e a tabela do IBGE e monta o DataFrame final.
+    Espera o ano com 2 dígitos e o mês abreviado (ex.: "25", "jan").
+    """
+    chave = ("SAF", ano, mes)
+    if usar_cache:
+        df = cache_dados.obter(chave)
+        if df is not None:
+            logger.info(f"Usando dados já carregados em memória: SAF {mes}/{ano}")
+            return df
 
     url, _ = extracao(ano, mes)
-    pdf = download(url)
-    if not pdf:
-        return None, None
 
-    dfs = transformar_pdf_em_dataframe(pdf)
-    if not dfs:
-        return None, None
+    # PDF da SEFAZ e tabela do IBGE são baixados ao mesmo tempo
+    conteudo_pdf, html_ibge = baixar_varios([
+        {"url": url, "headers": HEADERS, "timeout": 60, "fonte": "SAF"},
+        {"url": URL_IBGE, "timeout": 20, "fonte": "SAF", "etapa": "download_ibge"},
+    ])
+    if not conteudo_pdf:
+        return None
+    pdf = io.BytesIO(conteudo_pdf)
 
-    df = tratar_tabelas(dfs)
-    df = remover_linhas_indesejadas(df)
-    df = processar_df(df)
+    with etapa("SAF", "tabula") as m:
+        dfs = transformar_pdf_em_dataframe(pdf)
+        if not dfs:
+            m["status"] = "erro"
+            return None
+        m["linhas_saida"] = sum(len(d) for d in dfs)
+
+    with etapa("SAF", "limpeza") as m:
+        m["linhas_entrada"] = sum(len(d) for d in dfs)
+        df = tratar_tabelas(dfs)
+        df = remover_linhas_indesejadas(df)
+        df = processar_df(df)
+        m["linhas_saida"] = len(df)
+
+    df_ibge = None
+    if html_ibge:
+        df_ibge = ler_codigos_ibge(html_ibge.decode("utf-8", errors="replace"))
+    if df_ibge is None:
+        # Sem os códigos do IBGE o arquivo sai incompleto: entrega, mas não
+        # guarda, para a próxima requisição (ou o agendador) tentar de novo
+        logger.warning(f"SAF {mes}/{ano} sem os códigos do IBGE; não vai para o cache.")
+        return df
 
-    df_ibge = download_codigos_ibge()
-    if df_ibge is not None:
+    with etapa("SAF", "merge_ibge") as m:
+        m["linhas_entrada"] = len(df)
         df["key"] = df["MUNICÍPIOS"].str.upper()
         df_ibge["key"] = df_ibge["Municípios da Bahia"].str.upper()
         df = df.merge(df_ibge, how="left", on="key")
+        m["linhas_saida"] = len(df)
+
+    cache_dados.guardar(chave, df)
+    return df
+
+
+def processar_saf(ano, mes):
+    ano = str(ano)[-2:]
+    mes = MES_MAP.get(str(mes))
+
+    if not mes:
+        return None, None
+
+    df = carregar_df_saf(ano, mes)
+    if df is None:
+        return None, None
 
     output = io.BytesIO()
-    df.to_excel(output, index=False)
+    with etapa("SAF", "excel") as m:
+        m["linhas_entrada"] = len(df)
+        df.to_excel(output, index=False)
+        m["bytes"] = output.tell()
     output.seek(0)
 
     return output, f"SAF_{ano}_{mes}.xlsx"
@@ -1,6 +1,14 @@
+import logging
 import pandas as pd
 from playwright.sync_api import sync_playwright
 import os
+import tempfile
+import threading
+
+from scripts import cache_dados
+from scripts.metricas import etapa
+
+logger = logging.getLogger("indica.smt")
 
 # Mapeamento de Mês
 MESES_MAP = {
@@ -9,13 +17,26 @@ MESES_MAP = {
     '9': 'Setembro', '10': 'Outubro', '11': 'Novembro', '12': 'Dezembro'
 }
 
-def SMT_download():
+# Pasta segura onde os arquivos do SMT são gravados e página do Novo Caged.
+# Podem ser trocadas por variável de ambiente (ex.: servidor local do benchmark)
+PASTA_SMT = os.environ.get("INDICA_PASTA_SMT", "/var/www/indica/automacao_python/documentos_novos")
+URL_CAGED = os.environ.get(
+    "INDICA_URL_CAGED",
+    "https://www.gov.br/trabalho-e-emprego/pt-br/assuntos/estatisticas-trabalho/novo-caged"
+)
+
+# Uma carga a frio por vez: requisições simultâneas esperam a primeira
+# e reaproveitam a tabela que ela deixou no cache.
+_lock_carga = threading.Lock()
+
+def SMT_download(nome_arquivo=None):
     """
     Baixa o arquivo do Novo Caged usando Playwright.
+    Sem nome_arquivo, grava num arquivo temporário único, para que
+    downloads simultâneos não sobrescrevam (nem apaguem) um ao outro.
     """
-    print("Iniciando o download SMT (Playwright)...")
-    # Define a pasta segura
-    temp_folder = "/var/www/indica/automacao_python/documentos_novos"
+    logger.info("Iniciando o download SMT (Playwright)...")
+    temp_folder = PASTA_SMT
     os.makedirs(temp_folder, exist_ok=True)
 
     try:
@@ -25,14 +46,14 @@ def SMT_download():
             page = browser.new_page()
             
             # Aumentei o timeout para 90s (governo é lento)
-            page.goto("https://www.gov.br/trabalho-e-emprego/pt-br/assuntos/estatisticas-trabalho/novo-caged", timeout=90000)
-            print(f"Página acessada: {page.title()}") 
+            page.goto(URL_CAGED, timeout=90000)
+            logger.info(f"Página acessada: {page.title()}")
 
             link_locator = page.get_by_role("link", name="Tabelas.xlsx")
             link_url = link_locator.get_attribute("href")
 
             if link_url:
-                print(f"Link encontrado: {link_url}")
+                logger.info(f"Link encontrado: {link_url}")
                 page.goto(link_url)
                 
                 # Tenta baixar
@@ -45,47 +66,107 @@ def SMT_download():
                         pass # Se baixar sozinho, ok
                 
                 download = download_info.value
-                file_path = os.path.join(temp_folder, "SMT_temp_raw.xlsx")
+                if nome_arquivo:
+                    file_path = os.path.join(temp_folder, nome_arquivo)
+                else:
+                    fd, file_path = tempfile.mkstemp(prefix="SMT_raw_", suffix=".xlsx", dir=temp_folder)
+                    os.close(fd)
                 download.save_as(file_path)
 
-                print(f"Download concluído: {file_path}")
+                logger.info(f"Download concluído: {file_path}")
                 #browser.close()
                 return file_path
             else:
-                print("ERRO: Link não encontrado.")
+                logger.error("ERRO: Link não encontrado.")
                 #browser.close()
                 return None
             
     except Exception as e:
-        print(f"Erro no Playwright: {e}")
+        logger.error(f"Erro no Playwright: {e}")
         return None
 
-def processar_excel(caminho_original, uf, ano, mes_num):
+def ler_tabela_smt(caminho_original):
     """
-    Filtra o Excel e SALVA NO DISCO.
+    Lê a 'Tabela 8' do Excel do Novo Caged.
     """
     try:
         SMT_Sheet = 'Tabela 8' 
+        df = pd.read_excel(caminho_original, sheet_name=SMT_Sheet, header=4)
+        df.columns = df.columns.str.strip()
+        return df
+    except Exception as e:
+        logger.error(f"Erro ao ler a planilha SMT: {e}")
+        return None
+
+def carregar_tabela_smt(usar_cache=True):
+    """
+    Baixa o Excel do Novo Caged e devolve a 'Tabela 8' como DataFrame.
+    Se o agendador já deixou a tabela quente, usa a cópia em memória.
+    """
+    chave = ("SMT", "Tabela 8")
+    if usar_cache:
+        df = cache_dados.obter(chave)
+        if df is not None:
+            logger.info("Usando dados já carregados em memória: Novo Caged")
+            return df
+
+    with _lock_carga:
+        # Outra requisição pode ter carregado a tabela enquanto esta esperava
+        if usar_cache:
+            df = cache_dados.obter(chave)
+            if df is not None:
+                logger.info("Usando dados já carregados em memória: Novo Caged")
+                return df
+
+        with etapa("SMT", "download") as m:
+            caminho_raw = SMT_download()
+            if not caminho_raw or not os.path.exists(caminho_raw):
+                m["status"] = "erro"
+                return None
+            m["bytes"] = os.path.getsize(caminho_raw)
+
+        with etapa("SMT", "leitura") as m:
+            df = ler_tabela_smt(caminho_raw)
+            if df is None:
+                m["status"] = "erro"
+            else:
+                m["linhas_saida"] = len(df)
+
+        # Limpeza
+        try:
+            os.remove(caminho_raw)
+        except:
+            pass
+
+        if df is not None:
+            cache_dados.guardar(chave, df)
+        return df
+
+def processar_excel(df, uf, ano, mes_num):
+    """
+    Filtra a 'Tabela 8' e SALVA NO DISCO.
+    """
+    try:
         nome_mes = MESES_MAP.get(str(mes_num))
         
         if not nome_mes:
-            print(f"Mês inválido: {mes_num}")
+            logger.warning(f"Mês inválido: {mes_num}")
             return None, None
             
-        print(f"Processando para {uf} - {nome_mes}/{ano}")
-        
-        df = pd.read_excel(caminho_original, sheet_name=SMT_Sheet, header=4)
-        df.columns = df.columns.str.strip()
+        logger.info(f"Processando para {uf} - {nome_mes}/{ano}")
 
         coluna_data = f"{nome_mes}/{ano}"
         if coluna_data not in df.columns:
-            print(f"Coluna {coluna_data} não encontrada.")
+            logger.warning(f"Coluna {coluna_data} não encontrada.")
             return None, None
 
-        df_filtrado = df[df['UF'] == uf]
+        with etapa("SMT", "filtro") as m:
+            m["linhas_entrada"] = len(df)
+            df_filtrado = df[df['UF'] == uf]
+            m["linhas_saida"] = len(df_filtrado)
         
         if df_filtrado.empty:
-            print("Filtro vazio.")
+            logger.warning("Filtro vazio.")
             return None, None
 
         cols = ['UF', 'Código do Município', 'Município', coluna_data]
@@ -93,18 +174,30 @@ def processar_excel(caminho_original, uf, ano, mes_num):
 
         # SALVA NO DISCO
         nome_saida = f"SMT_{uf}_{ano}_{mes_num}.xlsx"
-        pasta_destino = "/var/www/indica/automacao_python/documentos_novos"
+        pasta_destino = PASTA_SMT
         os.makedirs(pasta_destino, exist_ok=True)
         
         caminho_final = os.path.join(pasta_destino, nome_saida)
         
-        df_final.to_excel(caminho_final, index=False)
-        print(f"Arquivo salvo: {caminho_final}")
+        with etapa("SMT", "excel") as m:
+            m["linhas_entrada"] = len(df_final)
+            # Grava num temporário e troca de uma vez: duas requisições iguais
+            # não escrevem no mesmo arquivo enquanto outra o envia
+            fd, caminho_temp = tempfile.mkstemp(prefix="SMT_", suffix=".xlsx", dir=pasta_destino)
+            os.close(fd)
+            try:
+                df_final.to_excel(caminho_temp, index=False)
+                os.replace(caminho_temp, caminho_final)
+            except Exception:
+                os.remove(caminho_temp)
+                raise
+            m["bytes"] = os.path.getsize(caminho_final)
+        logger.info(f"Arquivo salvo: {caminho_final}")
         
         return caminho_final, nome_saida
 
     except Exception as e:
-        print(f"Erro no processamento Pandas: {e}")
+        logger.error(f"Erro no processamento Pandas: {e}")
         return None, None
 
 # --- FUNÇÃO PRINCIPAL CORRIGIDA ---
@@ -112,23 +205,22 @@ def processar_excel(caminho_original, uf, ano, mes_num):
 def processar_smt(uf, ano, mes_num):
     
     try:
-        # 1. Baixa
-        caminho_raw = SMT_download()
+        # 1. Baixa (ou usa a tabela já carregada)
+        veio_do_cache = cache_dados.obter(("SMT", "Tabela 8")) is not None
+        df = carregar_tabela_smt()
+
+        # A tabela em memória pode ser de antes da publicação do mês pedido
+        nome_mes = MESES_MAP.get(str(mes_num))
+        if veio_do_cache and df is not None and nome_mes and f"{nome_mes}/{ano}" not in df.columns:
+            logger.info(f"Mês {nome_mes}/{ano} ausente da tabela em memória. Baixando de novo...")
+            df = carregar_tabela_smt(usar_cache=False)
         
-        if caminho_raw and os.path.exists(caminho_raw):
+        if df is not None:
             # 2. Processa
-            caminho_final, nome_final = processar_excel(caminho_raw, uf, ano, mes_num)
-            
-            # Limpeza
-            try:
-                os.remove(caminho_raw)
-            except:
-                pass
-                
-            return caminho_final, nome_final
+            return processar_excel(df, uf, ano, mes_num)
         else:
             return None, None
 
     except Exception as e:
-        print(f"Erro geral SMT: {e}")
+        logger.error(f"Erro geral SMT: {e}")
         return None, None
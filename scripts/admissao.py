@@ -0,0 +1,232 @@
+import collections
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from scripts import cache_dados, metricas
+
+logger = logging.getLogger("indica.admissao")
+
+# Orçamento de memória deste processo para os pipelines e quanto tempo um
+# job pode esperar na fila antes de ser recusado.
+# Com vários workers, o orçamento é por worker (memória do container / workers).
+# Os DataFrames guardados em cache_dados ocupam parte desse orçamento.
+ORCAMENTO_MB = int(os.environ.get("INDICA_MEMORIA_MB", 2048))
+
+# Um job esperando na fila segura uma thread do gunicorn (mesma variável do
+# gunicorn.conf.py). Jobs pesados, rodando ou na fila, ficam limitados a
+# JOBS_MAXIMOS, para sobrarem THREADS_LEVES threads para /, /metrics etc.
+THREADS = int(os.environ.get("INDICA_THREADS", 8))
+THREADS_LEVES = int(os.environ.get("INDICA_THREADS_LEVES", 2))
+JOBS_MAXIMOS = int(os.environ.get("INDICA_JOBS_MAXIMOS", max(THREADS - THREADS_LEVES, 1)))
+ESPERA_MAXIMA = float(os.environ.get("INDICA_ESPERA_MAXIMA", 120))
+RETRY_AFTER = int(os.environ.get("INDICA_RETRY_AFTER", 30))
+
+# Custo aproximado (MB) de cada pipeline a frio, sem contar o arquivo baixado:
+# SAF sobe uma JVM (Tabula) e SMT um Chromium (Playwright).
+CUSTO_BASE_MB = {
+    "SAE": 150,
+    "SAB": 250,
+    "SAF": 700,
+    "SMT": 600,
+}
+# Quando os dados já estão quentes, sobra só filtrar e gerar o Excel
+CUSTO_QUENTE_MB = 100
+
+# O SAE segura ~2x o CSV anual do Comexstat (download + DataFrame).
+# Enquanto o tamanho real não é conhecido, assume este valor.
+TAMANHO_PADRAO_COMEXSTAT_MB = 250
+
+_tamanhos_mb = {}
+_em_uso_mb = 0
+_rodando = 0
+_fila = collections.deque()
+_recusados = 0
+_cond = threading.Condition()
+
+
+class CapacidadeEsgotada(Exception):
+    """
+    O servidor não tem memória livre nem lugar na fila para o job.
+    """
+
+    def __init__(self, mensagem, retry_after=RETRY_AFTER):
+        super().__init__(mensagem)
+        self.retry_after = retry_after
+
+
+def _estado():
+    return {
+        "orcamento_mb": ORCAMENTO_MB,
+        "em_uso_mb": _em_uso_mb,
+        "cache_mb": round(cache_dados.tamanho_total_mb(), 1),
+        "rodando": _rodando,
+        "fila": len(_fila),
+        "recusados": _recusados,
+    }
+
+
+def _publicar():
+    # Chamada com _cond: deixa o estado visível para o /metrics dos outros workers
+    metricas.gravar_compartilhado("admissao", _estado())
+
+
+def registrar_tamanho(chave, total_bytes):
+    """
+    Guarda o tamanho real de um download para melhorar as próximas estimativas.
+    """
+    with _cond:
+        _tamanhos_mb[chave] = total_bytes / 1024 / 1024
+
+
+def custo_a_frio(fonte, **params):
+    """
+    Custo de um job que vai baixar e processar os dados de novo,
+    mesmo que eles estejam no cache (ex.: ingestão do agendador).
+    """
+    if fonte == "SAE":
+        chave = ("SAE", str(params.get("tipo")).strip().upper(), str(params.get("ano")).strip())
+        with _cond:
+            tamanho = _tamanhos_mb.get(chave, TAMANHO_PADRAO_COMEXSTAT_MB)
+        return CUSTO_BASE_MB["SAE"] + 2 * tamanho
+    return CUSTO_BASE_MB.get(fonte, CUSTO_QUENTE_MB)
+
+
+def estimar_custo(fonte, **params):
+    """
+    Estima quantos MB um job vai usar, a partir da fonte e dos parâmetros.
+
+    Só conta como quente se o mês pedido já está nos dados em memória:
+    senão o pipeline baixa tudo de novo (mesmas regras de SAE e SMT).
+    Os módulos dos pipelines já foram importados pela rota que chama aqui.
+    """
+    try:
+        if fonte == "SAE":
+            chave = ("SAE", str(params.get("tipo")).strip().upper(), str(params.get("ano")).strip())
+            df = cache_dados.obter(chave)
+            if df is not None:
+                mes = params.get("mes")
+                if mes is None or "CO_MES" not in df.columns or (df["CO_MES"] == int(mes)).any():
+                    return CUSTO_QUENTE_MB
+
+        if fonte == "SAB":
+            chave = ("SAB", int(params.get("ano")), int(params.get("mes")))
+            if cache_dados.obter(chave) is not None:
+                return CUSTO_QUENTE_MB
+
+        if fonte == "SAF":
+            from scripts.SAF import MES_MAP
+            chave = ("SAF", str(params.get("ano"))[-2:], MES_MAP.get(str(params.get("mes"))))
+            if cache_dados.obter(chave) is not None:
+                return CUSTO_QUENTE_MB
+
+        if fonte == "SMT":
+            df = cache_dados.obter(("SMT", "Tabela 8"))
+            if df is not None:
+                from scripts.SMT import MESES_MAP
+                nome_mes = MESES_MAP.get(str(params.get("mes")))
+                if not nome_mes or f"{nome_mes}/{params.get('ano')}" in df.columns:
+                    return CUSTO_QUENTE_MB
+
+    except (TypeError, ValueError):
+        # Parâmetros inválidos: o próprio pipeline vai recusar o job
+        return CUSTO_QUENTE_MB
+
+    return custo_a_frio(fonte, **params)
+
+
+def _cabe(custo_mb):
+    """
+    O job cabe no que sobra do orçamento, descontando os jobs em andamento
+    e o que já está em cache. Com nada rodando, qualquer job entra
+    (um job maior que o orçamento roda sozinho).
+    """
+    if _em_uso_mb == 0:
+        return True
+    livre = ORCAMENTO_MB - cache_dados.tamanho_total_mb()
+    return _em_uso_mb + custo_mb <= livre
+
+
+@contextmanager
+def reservar(fonte, custo_mb):
+    """
+    Reserva 'custo_mb' do orçamento enquanto o job roda.
+
+    Se não houver memória livre, o job entra numa fila (ordem de chegada).
+    JOBS_MAXIMOS jobs já rodando ou na fila, ou espera maior que
+    ESPERA_MAXIMA, levantam CapacidadeEsgotada.
+    """
+    global _em_uso_mb, _rodando, _recusados
+
+    with _cond:
+        if _rodando + len(_fila) >= JOBS_MAXIMOS:
+            _recusados += 1
+            _publicar()
+            logger.warning(f"Job {fonte} recusado: {_rodando} jobs rodando e {len(_fila)} na fila.")
+            raise CapacidadeEsgotada("Servidor ocupado: fila de processamento cheia.")
+
+        if _fila or not _cabe(custo_mb):
+
+            senha = object()
+            _fila.append(senha)
+            _publicar()
+            logger.info(f"Job {fonte} ({custo_mb:.0f} MB) na fila, posição {len(_fila)}.")
+            prazo = time.monotonic() + ESPERA_MAXIMA
+            while _fila[0] is not senha or not _cabe(custo_mb):
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    _fila.remove(senha)
+                    _recusados += 1
+                    _publicar()
+                    _cond.notify_all()
+                    logger.warning(f"Job {fonte} recusado: esperou {ESPERA_MAXIMA:.0f}s na fila.")
+                    raise CapacidadeEsgotada("Servidor ocupado: tempo de espera na fila esgotado.")
+                _cond.wait(restante)
+            _fila.popleft()
+            # O próximo da fila pode caber no que sobrou
+            _cond.notify_all()
+
+        _em_uso_mb += custo_mb
+        _rodando += 1
+        _publicar()
+        logger.info(f"Job {fonte} admitido ({custo_mb:.0f} MB, em uso: {_em_uso_mb:.0f}/{ORCAMENTO_MB} MB).")
+
+    try:
+        yield
+    finally:
+        with _cond:
+            _em_uso_mb -= custo_mb
+            _rodando -= 1
+            _publicar()
+            _cond.notify_all()
+
+
+def admitir(fonte, **params):
+    """
+    Atalho para as rotas: estima o custo do job e reserva a memória.
+    """
+    return reservar(fonte, estimar_custo(fonte, **params))
+
+
+def renderizar_prometheus():
+    """
+    Estado da admissão de todos os workers (pasta INDICA_METRICAS_DIR):
+    recusados somados num contador único e os gauges por worker (pid).
+    """
+    estados = metricas.ler_compartilhados("admissao") or {}
+    with _cond:
+        estados[os.getpid()] = _estado()
+
+    # Workers que já morreram continuam no contador, mas não nos gauges
+    vivos = sorted(pid for pid in estados if pid == os.getpid() or metricas.processo_vivo(pid))
+    linhas = [
+        "# TYPE indica_admissao_recusados_total counter",
+        f"indica_admissao_recusados_total {sum(e['recusados'] for e in estados.values())}",
+    ]
+    for campo in ["orcamento_mb", "em_uso_mb", "cache_mb", "rodando", "fila"]:
+        linhas.append(f"# TYPE indica_admissao_{campo} gauge")
+        for pid in vivos:
+            linhas.append(f'indica_admissao_{campo}{{pid="{pid}"}} {estados[pid][campo]}')
+    return "\n".join(linhas) + "\n"
@@ -0,0 +1,278 @@
+import logging
+import os
+import threading
+import time
+from datetime import date
+
+import requests
+import urllib3
+
+from scripts import admissao, cache_dados
+from scripts.admissao import CapacidadeEsgotada
+
+logger = logging.getLogger("indica.agendador")
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# Intervalo entre as verificações (segundos) e fontes monitoradas.
+# Pode ser ajustado por variáveis de ambiente.
+INTERVALO_PADRAO = int(os.environ.get("INDICA_AGENDADOR_INTERVALO", 3600))
+FONTES_PADRAO = os.environ.get("INDICA_AGENDADOR_FONTES", "SAE,SAB,SAF,SMT")
+
+# Quantos meses para trás procurar publicações (ESTBAN e SEFAZ saem com atraso)
+MESES_PARA_TRAS = 3
+
+# Assinatura (ETag/Last-Modified/tamanho) da última versão ingerida de cada URL
+_versoes = {}
+_ultima_verificacao = {}
+_lock = threading.Lock()
+_parar = threading.Event()
+_thread = None
+
+
+def _meses_recentes(quantidade):
+    """
+    Retorna [(ano, mes), ...] do mês atual para trás.
+    """
+    hoje = date.today()
+    ano, mes = hoje.year, hoje.month
+    meses = []
+    for _ in range(quantidade):
+        meses.append((ano, mes))
+        mes -= 1
+        if mes == 0:
+            ano, mes = ano - 1, 12
+    return meses
+
+
+def _assinatura(url, **kwargs):
+    """
+    Faz um HEAD barato e devolve uma assinatura da versão publicada,
+    ou None se o arquivo ainda não existe.
+    """
+    try:
+        r = requests.head(url, timeout=30, allow_redirects=True, **kwargs)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Agendador: erro ao verificar {url}: {e}")
+        return None
+
+    if r.status_code != 200:
+        return None
+
+    return (
+        r.headers.get("ETag"),
+        r.headers.get("Last-Modified"),
+        r.headers.get("Content-Length"),
+    )
+
+
+def _eh_novo(url, assinatura, chave):
+    """
+    Precisa ingerir se a publicação mudou ou se os dados dela saíram do
+    cache (venceram ou foram removidos pelo limite de memória).
+    """
+    if assinatura is None:
+        return False
+    with _lock:
+        mudou = _versoes.get(url) != assinatura
+    return mudou or not cache_dados.contem(chave)
+
+
+def _registrar(url, assinatura):
+    with _lock:
+        _versoes[url] = assinatura
+
+
+def _ingerir(fonte, custo_mb, funcao, *args, **kwargs):
+    """
+    Roda uma ingestão dentro do orçamento de memória, como as rotas.
+    Sem capacidade, a publicação fica para a próxima rodada.
+    """
+    try:
+        with admissao.reservar(fonte, custo_mb):
+            return funcao(*args, **kwargs)
+    except CapacidadeEsgotada:
+        logger.warning(f"Agendador: sem memória para ingerir {fonte} agora; tenta na próxima rodada.")
+        return None
+
+
+def _confirmar_se_igual(url, assinatura, chave):
+    """
+    Se a publicação é a mesma já ingerida, renova a validade no cache.
+    """
+    with _lock:
+        igual = assinatura is not None and _versoes.get(url) == assinatura
+    if igual:
+        cache_dados.confirmar(chave)
+
+
+# Cada verificador importa o seu pipeline só quando roda, para que
+# importar o agendador (ex.: em /status-dados) não carregue todos eles.
+def verificar_sae():
+    from scripts.SAE import baixar_em_memoria, link_comexstat
+
+    ano = str(date.today().year)
+    for tipo in ["EXP", "IMP"]:
+        url = link_comexstat(tipo, ano)
+        assinatura = _assinatura(url, verify=False)
+        _confirmar_se_igual(url, assinatura, ("SAE", tipo, ano))
+        if _eh_novo(url, assinatura, ("SAE", tipo, ano)):
+            logger.info(f"Agendador: Comexstat {tipo}_{ano} novo ou fora do cache. Ingerindo...")
+            custo = admissao.custo_a_frio("SAE", tipo=tipo, ano=ano)
+            if _ingerir("SAE", custo, baixar_em_memoria, tipo, ano, usar_cache=False) is not None:
+                _registrar(url, assinatura)
+
+
+def verificar_sab():
+    from scripts.SAB import baixar_e_processar_varios_meses, link_estban
+
+    novos = {}
+    for ano, mes in _meses_recentes(MESES_PARA_TRAS + 1):
+        url = link_estban(ano, mes)
+        assinatura = _assinatura(url)
+        _confirmar_se_igual(url, assinatura, ("SAB", ano, mes))
+        if _eh_novo(url, assinatura, ("SAB", ano, mes)):
+            logger.info(f"Agendador: ESTBAN {ano}{mes:02d} novo ou fora do cache. Ingerindo...")
+            novos[(ano, mes)] = (url, assinatura)
+
+    if not novos:
+        return
+
+    # Os meses novos são baixados ao mesmo tempo, então o custo soma
+    custo = admissao.custo_a_frio("SAB") * len(novos)
+    resultados = _ingerir("SAB", custo, baixar_e_processar_varios_meses, list(novos)) or {}
+    for periodo, df in resultados.items():
+        if df is not None:
+            _registrar(*novos[periodo])
+
+
+def verificar_saf():
+    from scripts.SAF import HEADERS, MES_MAP, carregar_df_saf, extracao
+
+    for ano, mes in _meses_recentes(MESES_PARA_TRAS):
+        ano_saf = str(ano)[-2:]
+        mes_saf = MES_MAP[str(mes)]
+        url, _ = extracao(ano_saf, mes_saf)
+        assinatura = _assinatura(url, headers=HEADERS)
+        _confirmar_se_igual(url, assinatura, ("SAF", ano_saf, mes_saf))
+        if _eh_novo(url, assinatura, ("SAF", ano_saf, mes_saf)):
+            logger.info(f"Agendador: SEFAZ {mes_saf}/{ano_saf} novo ou fora do cache. Ingerindo...")
+            custo = admissao.custo_a_frio("SAF")
+            _ingerir("SAF", custo, carregar_df_saf, ano_saf, mes_saf, usar_cache=False)
+            # Sem o merge do IBGE o DataFrame não vai para o cache; não registra
+            # a versão, para tentar de novo na próxima rodada
+            if cache_dados.contem(("SAF", ano_saf, mes_saf)):
+                _registrar(url, assinatura)
+
+
+def verificar_smt():
+    from bs4 import BeautifulSoup
+    from scripts.SAF import HEADERS
+    from scripts.SMT import URL_CAGED, carregar_tabela_smt
+
+    # A página do Novo Caged não expõe o arquivo diretamente; o link
+    # "Tabelas.xlsx" muda a cada publicação, então ele é a assinatura.
+    headers = dict(HEADERS)
+    with _lock:
+        etag_pagina = _versoes.get(("pagina", URL_CAGED))
+    # Sem a tabela em memória, um 304 não adianta: precisa do link para baixar
+    if etag_pagina and cache_dados.contem(("SMT", "Tabela 8")):
+        headers["If-None-Match"] = etag_pagina
+
+    try:
+        r = requests.get(URL_CAGED, headers=headers, timeout=60)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Agendador: erro ao verificar {URL_CAGED}: {e}")
+        return
+
+    if r.status_code == 304:
+        # A página não mudou desde a última verificação
+        cache_dados.confirmar(("SMT", "Tabela 8"))
+        return
+    if r.status_code != 200:
+        return
+
+    soup = BeautifulSoup(r.text, "html.parser")
+    link = soup.find("a", string=lambda texto: texto and "Tabelas.xlsx" in texto)
+    if link is None:
+        logger.warning("Agendador: link 'Tabelas.xlsx' não encontrado no Novo Caged.")
+        return
+
+    assinatura = link.get("href")
+    _confirmar_se_igual(URL_CAGED, assinatura, ("SMT", "Tabela 8"))
+    if _eh_novo(URL_CAGED, assinatura, ("SMT", "Tabela 8")):
+        logger.info("Agendador: publicação do Novo Caged nova ou fora do cache. Ingerindo...")
+        custo = admissao.custo_a_frio("SMT")
+        if _ingerir("SMT", custo, carregar_tabela_smt, usar_cache=False) is None:
+            return
+        _registrar(URL_CAGED, assinatura)
+
+    if r.headers.get("ETag"):
+        _registrar(("pagina", URL_CAGED), r.headers["ETag"])
+
+
+VERIFICADORES = {
+    "SAE": verificar_sae,
+    "SAB": verificar_sab,
+    "SAF": verificar_saf,
+    "SMT": verificar_smt,
+}
+
+
+def verificar_fontes(fontes=None):
+    """
+    Faz uma rodada de verificação em todas as fontes.
+    Um erro em uma fonte não impede a verificação das outras.
+    """
+    fontes = fontes or [f.strip().upper() for f in FONTES_PADRAO.split(",") if f.strip()]
+    for fonte in fontes:
+        verificador = VERIFICADORES.get(fonte)
+        if verificador is None:
+            logger.warning(f"Agendador: fonte desconhecida '{fonte}'.")
+            continue
+        try:
+            verificador()
+        except Exception as e:
+            logger.error(f"Agendador: erro inesperado ao verificar {fonte}: {e}")
+        with _lock:
+            _ultima_verificacao[fonte] = time.time()
+
+
+def _loop(intervalo, fontes):
+    while not _parar.is_set():
+        verificar_fontes(fontes)
+        _parar.wait(intervalo)
+
+
+def iniciar_agendador(intervalo=INTERVALO_PADRAO, fontes=None):
+    """
+    Sobe o agendador numa thread em segundo plano (uma vez por processo).
+    """
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return _thread
+
+    _parar.clear()
+    _thread = threading.Thread(
+        target=_loop, args=(intervalo, fontes),
+        name="agendador-indica", daemon=True
+    )
+    _thread.start()
+    logger.info(f"Agendador iniciado (intervalo: {intervalo}s).")
+    return _thread
+
+
+def parar_agendador():
+    _parar.set()
+
+
+def estado():
+    """
+    Resumo do que está quente e de quando cada fonte foi verificada.
+    """
+    with _lock:
+        ultima_verificacao = dict(_ultima_verificacao)
+    return {
+        "aquecidos": cache_dados.aquecidos(),
+        "ultima_verificacao": ultima_verificacao,
+    }
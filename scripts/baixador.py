@@ -0,0 +1,102 @@
+import logging
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from scripts.metricas import etapa
+
+logger = logging.getLogger("indica.baixador")
+
+
+# Quantos downloads simultâneos cada site do governo aguenta
+LIMITE_POR_HOST = 4
+TIMEOUT_PADRAO = 600
+
+# Um semáforo por host, compartilhado pelo processo inteiro: cada chamada
+# de baixar_varios roda no seu próprio event loop (rotas e agendador em
+# threads diferentes), então o limite precisa valer entre elas.
+_semaforos = {}
+_lock_semaforos = threading.Lock()
+
+
+def _semaforo(host):
+    with _lock_semaforos:
+        if host not in _semaforos:
+            _semaforos[host] = threading.BoundedSemaphore(LIMITE_POR_HOST)
+        return _semaforos[host]
+
+
+async def _ocupar_vaga(semaforo):
+    # Espera sem bloquear o event loop (os outros downloads seguem)
+    while not semaforo.acquire(blocking=False):
+        await asyncio.sleep(0.05)
+
+
+async def _baixar_um(sessao, pedido):
+    """
+    Baixa uma única URL respeitando o limite de conexões do host.
+    Retorna os bytes do arquivo ou None em caso de falha.
+    """
+    url = pedido["url"]
+    host = urlsplit(url).netloc
+    semaforo = _semaforo(host)
+
+    timeout = aiohttp.ClientTimeout(total=pedido.get("timeout", TIMEOUT_PADRAO))
+    # verify=False equivale ao verify=False do requests (SAE usa isso)
+    ssl = True if pedido.get("verify", True) else False
+
+    await _ocupar_vaga(semaforo)
+    logger.info(f"Baixando (assíncrono): {url}...")
+    try:
+        with etapa(pedido.get("fonte", host), pedido.get("etapa", "download")) as m:
+            async with sessao.get(
+                url,
+                headers=pedido.get("headers"),
+                timeout=timeout,
+                ssl=ssl
+            ) as resposta:
+                if resposta.status != 200:
+                    logger.error(f"Erro: Falha ao baixar {url}. Status: {resposta.status}")
+                    m["status"] = "erro"
+                    return None
+
+                buffer = bytearray()
+                async for chunk in resposta.content.iter_chunked(8192):
+                    buffer.extend(chunk)
+            m["bytes"] = len(buffer)
+
+        logger.info(f"Download concluído: {url} ({len(buffer) / 1024 / 1024:.2f} MB)")
+        return bytes(buffer)
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error(f"Erro de conexão ao baixar {url}: {e}")
+        return None
+    finally:
+        semaforo.release()
+
+
+async def baixar_varios_async(pedidos):
+    """
+    Baixa vários arquivos ao mesmo tempo, no máximo LIMITE_POR_HOST
+    conexões simultâneas por host em todo o processo.
+
+    Cada pedido é um dict com 'url' e, opcionalmente, 'headers',
+    'timeout', 'verify' e 'fonte'/'etapa' (rótulos das métricas). Retorna uma lista (na mesma ordem dos pedidos)
+    com os bytes de cada arquivo ou None para os que falharam.
+    """
+    async with aiohttp.ClientSession() as sessao:
+        tarefas = [_baixar_um(sessao, pedido) for pedido in pedidos]
+        return await asyncio.gather(*tarefas)
+
+
+def baixar_varios(pedidos):
+    """
+    Versão síncrona de baixar_varios_async, para ser chamada pelos
+    scripts e pelas rotas do Flask (que não rodam dentro de um event loop).
+    """
+    pedidos = [p if isinstance(p, dict) else {"url": p} for p in pedidos]
+    if not pedidos:
+        return []
+    return asyncio.run(baixar_varios_async(pedidos))
@@ -0,0 +1,122 @@
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger("indica.cache")
+
+# Dados já baixados e processados, compartilhados entre as requisições
+# do mesmo processo. A chave é uma tupla, ex.: ("SAE", "EXP", "2025").
+#
+# Uma entrada vale por VALIDADE segundos desde que foi gravada ou desde a
+# última vez que o agendador confirmou que a publicação não mudou
+# (confirmar()). O total em memória fica limitado a LIMITE_MB; ao passar
+# disso, sai a entrada usada há mais tempo.
+VALIDADE = int(os.environ.get("INDICA_CACHE_VALIDADE", 6 * 3600))
+LIMITE_MB = int(os.environ.get("INDICA_CACHE_MB", 1024))
+
+_dados = collections.OrderedDict()
+_total_bytes = 0
+_lock = threading.Lock()
+
+
+def _tamanho(valor):
+    if hasattr(valor, "memory_usage"):
+        return int(valor.memory_usage(index=True, deep=True).sum())
+    return sys.getsizeof(valor)
+
+
+def _remover(chave):
+    global _total_bytes
+    item = _dados.pop(chave, None)
+    if item:
+        _total_bytes -= item["bytes"]
+
+
+def obter(chave):
+    """
+    Retorna o valor guardado para a chave ou None se ela não estiver
+    quente (ausente ou vencida).
+    """
+    with _lock:
+        item = _dados.get(chave)
+        if item is None:
+            return None
+        if time.time() - item["confirmado_em"] > VALIDADE:
+            logger.info(f"Cache vencido: {chave}")
+            _remover(chave)
+            return None
+        _dados.move_to_end(chave)
+        return item["valor"]
+
+
+def guardar(chave, valor):
+    global _total_bytes
+    tamanho = _tamanho(valor)
+    limite = LIMITE_MB * 1024 * 1024
+    agora = time.time()
+
+    with _lock:
+        _remover(chave)
+        if tamanho > limite:
+            logger.warning(f"Não cabe no cache ({tamanho / 1024 / 1024:.0f} MB): {chave}")
+            return
+
+        while _dados and _total_bytes + tamanho > limite:
+            antiga, _ = next(iter(_dados.items()))
+            logger.info(f"Removendo do cache para liberar espaço: {antiga}")
+            _remover(antiga)
+
+        _dados[chave] = {
+            "valor": valor,
+            "bytes": tamanho,
+            "atualizado_em": agora,
+            "confirmado_em": agora,
+        }
+        _total_bytes += tamanho
+
+
+def contem(chave):
+    """
+    A chave está quente? Não conta como uso (não mexe na ordem do LRU).
+    """
+    with _lock:
+        item = _dados.get(chave)
+        return item is not None and time.time() - item["confirmado_em"] <= VALIDADE
+
+
+def confirmar(chave):
+    """
+    O agendador viu que a publicação não mudou: renova a validade.
+    """
+    with _lock:
+        item = _dados.get(chave)
+        if item:
+            item["confirmado_em"] = time.time()
+
+
+def remover(chave):
+    with _lock:
+        _remover(chave)
+
+
+def tamanho_total_mb():
+    with _lock:
+        return _total_bytes / 1024 / 1024
+
+
+def aquecidos():
+    """
+    Lista o que está em memória, quando foi atualizado e quanto ocupa.
+    """
+    with _lock:
+        return {
+            "/".join(str(parte) for parte in chave): {
+                "atualizado_em": item["atualizado_em"],
+                "confirmado_em": item["confirmado_em"],
+                "mb": round(item["bytes"] / 1024 / 1024, 1),
+            }
+            for chave, item in _dados.items()
+        }
@@ -0,0 +1,382 @@
+import contextvars
+import glob
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# ID da requisição atual; aparece em todos os logs emitidos durante ela
+id_requisicao = contextvars.ContextVar("id_requisicao", default="-")
+
+# Limites dos histogramas (no formato do Prometheus, "le")
+BUCKETS_DURACAO = [0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600]
+BUCKETS_BYTES = [1e4, 1e5, 1e6, 1e7, 5e7, 1e8, 5e8, 1e9]
+BUCKETS_LINHAS = [10, 100, 1e3, 1e4, 1e5, 1e6, 1e7]
+
+# Cada processo (worker do gunicorn) acumula as próprias métricas. Se
+# INDICA_METRICAS_DIR estiver definida (o gunicorn.conf.py faz isso), cada
+# worker grava um arquivo nessa pasta e /metrics soma todos eles, para que
+# os contadores não "voltem" quando o scrape cai em outro worker.
+_histogramas = {}
+_pico_rss = {}
+_execucoes = {}
+_lock = threading.Lock()
+
+# Intervalo de amostragem da memória durante as etapas
+INTERVALO_AMOSTRAGEM = 0.1
+_etapas_ativas = {}
+_amostrador_pid = None
+_amostrador_lock = threading.Lock()
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+logger = logging.getLogger("indica.metricas")
+
+
+class FormatoJSON(logging.Formatter):
+    """
+    Escreve cada log como uma linha JSON, com o ID da requisição.
+    """
+
+    def format(self, record):
+        dados = {
+            "momento": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+            "nivel": record.levelname,
+            "logger": record.name,
+            "id_requisicao": id_requisicao.get(),
+            "mensagem": record.getMessage(),
+        }
+        extras = getattr(record, "dados", None)
+        if extras:
+            dados.update(extras)
+        if record.exc_info:
+            dados["excecao"] = self.formatException(record.exc_info)
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+def configurar_logs(nivel=logging.INFO):
+    """
+    Configura o logger "indica" (usado pelas rotas e scripts) para JSON.
+    """
+    raiz = logging.getLogger("indica")
+    if raiz.handlers:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(FormatoJSON())
+    raiz.addHandler(handler)
+    raiz.setLevel(nivel)
+    raiz.propagate = False
+
+
+def pico_rss_bytes():
+    """
+    Pico de memória residente do processo desde que ele subiu (e dos
+    filhos já encerrados). No Linux ru_maxrss vem em KB.
+    """
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(proprio, filhos) * 1024
+
+
+def _rss_pid(pid):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * _PAGINA
+
+
+def _filhos(pid):
+    filhos = []
+    for arquivo in glob.glob(f"/proc/{pid}/task/*/children"):
+        try:
+            with open(arquivo) as f:
+                filhos.extend(int(p) for p in f.read().split())
+        except OSError:
+            pass
+    return filhos
+
+
+def rss_atual_bytes():
+    """
+    Memória residente agora: o processo mais os filhos vivos (o Chromium do
+    Playwright, o Java do Tabula quando roda em subprocesso).
+    Fora do Linux (sem /proc), cai para o pico do processo.
+    """
+    if not os.path.exists("/proc/self/statm"):
+        return pico_rss_bytes()
+
+    total = 0
+    pendentes = [os.getpid()]
+    while pendentes:
+        pid = pendentes.pop()
+        try:
+            total += _rss_pid(pid)
+        except (OSError, ValueError, IndexError):
+            continue
+        pendentes.extend(_filhos(pid))
+    return total
+
+
+def _amostrar():
+    while True:
+        time.sleep(INTERVALO_AMOSTRAGEM)
+        with _amostrador_lock:
+            ativas = list(_etapas_ativas.values())
+        if not ativas:
+            continue
+        rss = rss_atual_bytes()
+        for medicao in ativas:
+            if rss > medicao["rss_pico"]:
+                medicao["rss_pico"] = rss
+
+
+def _garantir_amostrador():
+    # Threads não sobrevivem ao fork: cada worker sobe o seu amostrador
+    global _amostrador_pid
+    with _amostrador_lock:
+        if _amostrador_pid == os.getpid():
+            return
+        _amostrador_pid = os.getpid()
+    threading.Thread(target=_amostrar, name="amostrador-rss", daemon=True).start()
+
+
+def _observar(nome, rotulos, buckets, valor):
+    chave = (nome, rotulos)
+    hist = _histogramas.get(chave)
+    if hist is None:
+        hist = {"buckets": buckets, "contagens": [0] * len(buckets), "soma": 0.0, "total": 0}
+        _histogramas[chave] = hist
+    for i, limite in enumerate(buckets):
+        if valor <= limite:
+            hist["contagens"][i] += 1
+    hist["soma"] += valor
+    hist["total"] += 1
+
+
+@contextmanager
+def etapa(fonte, nome):
+    """
+    Mede uma etapa do pipeline (download, leitura, filtro, excel...).
+
+    Uso:
+        with etapa("SAE", "download") as m:
+            ...
+            m["bytes"] = total_baixado
+            m["linhas_saida"] = len(df)
+
+    Registra duração, memória (RSS no início e pico amostrado durante a
+    etapa) e, se informados, bytes baixados e linhas de entrada/saída.
+    Uma exceção (ou m["status"] = "erro") marca a etapa como "erro".
+    """
+    _garantir_amostrador()
+    medidas = {}
+    rss_inicio = rss_atual_bytes()
+    medicao = {"rss_pico": rss_inicio}
+    with _amostrador_lock:
+        _etapas_ativas[id(medicao)] = medicao
+    inicio = time.perf_counter()
+    status = "ok"
+    try:
+        yield medidas
+    except Exception:
+        status = "erro"
+        raise
+    finally:
+        # O pipeline costuma tratar os próprios erros e devolver None;
+        # nesse caso ele marca m["status"] = "erro" antes de sair.
+        status = medidas.pop("status", status)
+        duracao = time.perf_counter() - inicio
+        with _amostrador_lock:
+            _etapas_ativas.pop(id(medicao), None)
+        rss = max(medicao["rss_pico"], rss_atual_bytes())
+        extra = rss - rss_inicio
+        rotulos = (("fonte", fonte), ("etapa", nome))
+
+        with _lock:
+            _observar("indica_etapa_duracao_segundos", rotulos, BUCKETS_DURACAO, duracao)
+            if "bytes" in medidas:
+                _observar("indica_etapa_bytes", rotulos, BUCKETS_BYTES, medidas["bytes"])
+            if "linhas_entrada" in medidas:
+                _observar("indica_etapa_linhas_entrada", rotulos, BUCKETS_LINHAS, medidas["linhas_entrada"])
+            if "linhas_saida" in medidas:
+                _observar("indica_etapa_linhas_saida", rotulos, BUCKETS_LINHAS, medidas["linhas_saida"])
+            _observar("indica_etapa_memoria_extra_bytes", rotulos, BUCKETS_BYTES, max(extra, 0))
+            _pico_rss[rotulos] = max(_pico_rss.get(rotulos, 0), rss)
+            chave = rotulos + (("status", status),)
+            _execucoes[chave] = _execucoes.get(chave, 0) + 1
+            _salvar_compartilhado()
+
+        logger.log(
+            logging.INFO if status == "ok" else logging.WARNING,
+            f"Etapa {fonte}/{nome} concluída ({status}) em {duracao:.2f}s",
+            extra={"dados": {
+                "fonte": fonte,
+                "etapa": nome,
+                "status": status,
+                "duracao_s": round(duracao, 4),
+                "rss_inicio_bytes": rss_inicio,
+                "pico_rss_bytes": rss,
+                **medidas,
+            }}
+        )
+
+
+def _rotulos_texto(rotulos):
+    return ",".join(f'{chave}="{valor}"' for chave, valor in rotulos)
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) and not valor.is_integer() else str(int(valor))
+
+
+def _pasta_compartilhada():
+    return os.environ.get("INDICA_METRICAS_DIR")
+
+
+def gravar_compartilhado(prefixo, estado):
+    """
+    Grava o estado deste processo em <prefixo>_<pid>.json na pasta
+    compartilhada (sem pasta definida, não faz nada).
+    """
+    pasta = _pasta_compartilhada()
+    if not pasta:
+        return
+    try:
+        os.makedirs(pasta, exist_ok=True)
+        destino = os.path.join(pasta, f"{prefixo}_{os.getpid()}.json")
+        temporario = destino + ".tmp"
+        with open(temporario, "w") as f:
+            json.dump(estado, f)
+        os.replace(temporario, destino)
+    except OSError as e:
+        logger.error(f"Erro ao gravar métricas em {pasta}: {e}")
+
+
+def ler_compartilhados(prefixo):
+    """
+    Lê o estado gravado por cada processo: {pid: estado}.
+    Sem pasta compartilhada, devolve None.
+    """
+    pasta = _pasta_compartilhada()
+    if not pasta:
+        return None
+    estados = {}
+    for arquivo in glob.glob(os.path.join(pasta, f"{prefixo}_*.json")):
+        try:
+            pid = int(os.path.basename(arquivo)[len(prefixo) + 1:-len(".json")])
+            with open(arquivo) as f:
+                estados[pid] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return estados
+
+
+def processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _salvar_compartilhado():
+    """
+    Grava o estado deste processo na pasta compartilhada (chamada com _lock).
+    """
+    gravar_compartilhado("metricas", {
+        "histogramas": [[nome, rotulos, hist] for (nome, rotulos), hist in _histogramas.items()],
+        "execucoes": [[rotulos, total] for rotulos, total in _execucoes.items()],
+        "pico_rss": [[rotulos, rss] for rotulos, rss in _pico_rss.items()],
+    })
+
+
+def _juntar_processos():
+    """
+    Soma histogramas e contadores de todos os workers (e máximo dos picos).
+    Sem pasta compartilhada, devolve só os dados deste processo.
+    """
+    pasta = _pasta_compartilhada()
+    if not pasta:
+        with _lock:
+            return (
+                {chave: dict(h, contagens=list(h["contagens"])) for chave, h in _histogramas.items()},
+                dict(_execucoes),
+                dict(_pico_rss),
+            )
+
+    histogramas, execucoes, pico_rss = {}, {}, {}
+    for estado in ler_compartilhados("metricas").values():
+        # Os workers que já morreram continuam contando, como num contador normal
+        for nome, rotulos, hist in estado["histogramas"]:
+            chave = (nome, tuple(tuple(r) for r in rotulos))
+            atual = histogramas.get(chave)
+            if atual is None:
+                histogramas[chave] = hist
+            else:
+                atual["contagens"] = [a + b for a, b in zip(atual["contagens"], hist["contagens"])]
+                atual["soma"] += hist["soma"]
+                atual["total"] += hist["total"]
+        for rotulos, total in estado["execucoes"]:
+            chave = tuple(tuple(r) for r in rotulos)
+            execucoes[chave] = execucoes.get(chave, 0) + total
+        for rotulos, rss in estado["pico_rss"]:
+            chave = tuple(tuple(r) for r in rotulos)
+            pico_rss[chave] = max(pico_rss.get(chave, 0), rss)
+    return histogramas, execucoes, pico_rss
+
+
+def renderizar_prometheus():
+    """
+    Gera o texto no formato de exposição do Prometheus para /metrics.
+    """
+    histogramas, execucoes, pico_rss = _juntar_processos()
+
+    linhas = []
+    nomes = sorted({nome for nome, _ in histogramas})
+    for nome in nomes:
+        linhas.append(f"# TYPE {nome} histogram")
+        for (nome_hist, rotulos), hist in sorted(histogramas.items(), key=lambda item: item[0]):
+            if nome_hist != nome:
+                continue
+            base = _rotulos_texto(rotulos)
+            for limite, contagem in zip(hist["buckets"], hist["contagens"]):
+                linhas.append(f'{nome}_bucket{{{base},le="{_numero(limite)}"}} {contagem}')
+            linhas.append(f'{nome}_bucket{{{base},le="+Inf"}} {hist["total"]}')
+            linhas.append(f"{nome}_sum{{{base}}} {hist['soma']}")
+            linhas.append(f"{nome}_count{{{base}}} {hist['total']}")
+
+    linhas.append("# TYPE indica_etapa_execucoes_total counter")
+    for rotulos, total in sorted(execucoes.items()):
+        linhas.append(f"indica_etapa_execucoes_total{{{_rotulos_texto(rotulos)}}} {total}")
+
+    linhas.append("# TYPE indica_etapa_pico_rss_bytes gauge")
+    for rotulos, rss in sorted(pico_rss.items()):
+        linhas.append(f"indica_etapa_pico_rss_bytes{{{_rotulos_texto(rotulos)}}} {rss}")
+
+    # Estes dois são do worker que respondeu o scrape
+    linhas.append("# TYPE indica_processo_rss_bytes gauge")
+    linhas.append(f'indica_processo_rss_bytes{{pid="{os.getpid()}"}} {rss_atual_bytes()}')
+    linhas.append("# TYPE indica_processo_pico_rss_bytes gauge")
+    linhas.append(f'indica_processo_pico_rss_bytes{{pid="{os.getpid()}"}} {pico_rss_bytes()}')
+    return "\n".join(linhas) + "\n"
+
+
+def resumo():
+    """
+    Totais por fonte/etapa, em formato simples (usado pelo benchmark).
+    """
+    totais = {}
+    with _lock:
+        for (nome, rotulos), hist in _histogramas.items():
+            fonte_etapa = "/".join(valor for _, valor in rotulos)
+            medida = nome.replace("indica_etapa_", "")
+            item = totais.setdefault(fonte_etapa, {})
+            item[medida] = hist["soma"]
+            if medida == "duracao_segundos":
+                item["execucoes"] = hist["total"]
+        for rotulos, rss in _pico_rss.items():
+            totais["/".join(valor for _, valor in rotulos)]["pico_rss_bytes"] = rss
+    return totais
@@ -0,0 +1,31 @@
+import gc
+import importlib
+import logging
+
+logger = logging.getLogger("indica.precarga")
+
+PIPELINES = ["scripts.SAE", "scripts.SAB", "scripts.SAF", "scripts.SMT"]
+
+
+def precarregar():
+    """
+    Usado no modo preload do gunicorn: o processo mestre importa todos os
+    pipelines antes de criar os workers, que herdam essas páginas de
+    memória por copy-on-write em vez de cada um importar tudo de novo.
+
+    Só imports entram aqui. Baixar dados ou subir a JVM do Tabula / o
+    Chromium no mestre atrasaria o boot, e a JVM não sobrevive ao fork;
+    o aquecimento dos dados acontece em cada worker (post_fork).
+    """
+    for modulo in PIPELINES:
+        try:
+            importlib.import_module(modulo)
+            logger.info(f"Pré-carregado: {modulo}")
+        except Exception as e:
+            # Um pipeline sem dependência instalada não impede os outros
+            logger.error(f"Erro ao pré-carregar {modulo}: {e}")
+
+    # Move o que já existe para a geração permanente do GC, para que as
+    # coletas nos workers não escrevam nessas páginas (e quebrem o COW).
+    gc.collect()
+    gc.freeze()